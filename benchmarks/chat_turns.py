@@ -0,0 +1,94 @@
+"""
+Per-turn rerun cost of the phase 5 chat as the conversation grows.
+
+Sends ``--turns`` messages through the chat panel with ``AppTest`` and times
+each turn twice: as a fragment rerun of the chat panel (what the browser
+triggers when a message is sent) and as a rerun of the whole study script.
+Gemini is the offline stand-in with zero latency, so the numbers are the
+script's own cost. Every message is a bubble, so the fragment column rises
+with the conversation; with ``--visible-messages N`` (the
+``chat_visible_messages`` secret) it should stay flat once N bubbles are
+drawn, as older messages fold into one element.
+
+    python benchmarks/chat_turns.py --turns 10 --repeat 5
+    python benchmarks/chat_turns.py --turns 10 --repeat 5 --visible-messages 4
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+
+from load_test import APP_PATH, NORMS, install_shared_runtime  # noqa: E402
+
+
+def _fragment_reruns():
+    """Let ``AppTest.run()`` request a fragment rerun, as a widget inside one does."""
+    from streamlit.runtime.scriptrunner_utils.script_requests import RerunData
+    from streamlit.testing.v1 import local_script_runner
+
+    queue = []
+    local_script_runner.RerunData = lambda **kw: RerunData(fragment_id_queue=list(queue), **kw)
+    return queue
+
+
+def start_chat(n):
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(APP_PATH, default_timeout=60)
+    at.query_params["PROLIFIC_PID"] = f"CHATBENCH{n:05d}"
+    at.run()
+    at.session_state["prompt_key"]      = "1"
+    at.session_state["norm_key"]        = next(iter(NORMS))
+    at.session_state["initial_opinion"] = {}
+    at.session_state["phase"]           = 5
+    at.run()
+    if at.exception:
+        raise RuntimeError(at.exception[0].value)
+    return at
+
+
+def time_turns(at, turns, fragment_queue, fragment):
+    fragment_queue[:] = list(at._fragment_storage._fragments) if fragment else []
+    times = []
+    for i in range(turns):
+        t0 = time.perf_counter()
+        at.chat_input[0].set_value(f"I see it differently, point {i + 1}.").run()
+        times.append((time.perf_counter() - t0) * 1000)
+        if at.exception:
+            raise RuntimeError(at.exception[0].value)
+    fragment_queue[:] = []
+    return times
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--turns", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=5, help="Conversations per mode; medians are reported.")
+    parser.add_argument("--visible-messages", type=int, default=0, help="chat_visible_messages secret; 0 draws every bubble.")
+    args = parser.parse_args(argv)
+
+    os.environ["GEMINI_BACKEND"] = "fake"
+    os.environ["FAKE_GEMINI"]    = json.dumps({"ttft_ms": 0, "ttft_jitter": 0, "tokens_per_s": 1e9})
+    install_shared_runtime({"gemini_backend": "fake", "chat_visible_messages": args.visible_messages})
+    fragment_queue = _fragment_reruns()
+
+    results = {}
+    for mode in ("fragment", "full script"):
+        runs = [
+            time_turns(start_chat(r), args.turns, fragment_queue, mode == "fragment")
+            for r in range(args.repeat)
+        ]
+        results[mode] = [statistics.median(turn) for turn in zip(*runs)]
+
+    print(f"{'turn':>4}{'fragment ms':>14}{'full script ms':>17}")
+    for i, (frag, full) in enumerate(zip(results["fragment"], results["full script"]), 1):
+        print(f"{i:>4}{frag:>14.1f}{full:>17.1f}")
+
+
+if __name__ == "__main__":
+    main()
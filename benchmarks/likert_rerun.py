@@ -0,0 +1,110 @@
+"""
+Rerun cost of answering the phase 9 rating scales (14 items).
+
+Answers every item of phase 9 with ``AppTest`` and reports the widgets on
+the page, the script runs each answer triggers and the time per answer.
+Works with the likert component and with the older one-``st.button``-per-
+option layout, so a previous version of the app can be measured the same
+way:
+
+    git show <rev>:app.py > app_before.py
+    python benchmarks/likert_rerun.py --app app_before.py
+    python benchmarks/likert_rerun.py
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+
+from load_test import APP_PATH, ROOT, block_key, install_shared_runtime  # noqa: E402
+
+ITEM_BUTTON = re.compile(r"^(?P<item>(?:involvement|threat|source)_\d)_(?P<val>[1-7])$")
+
+
+def count_script_runs():
+    """Count script executions, including the ones an st.rerun() adds."""
+    from streamlit.runtime.scriptrunner import script_runner
+
+    runs = [0]
+    original = script_runner.exec_func_with_error_handling
+
+    def exec_func_with_error_handling(*args, **kwargs):
+        runs[0] += 1
+        return original(*args, **kwargs)
+
+    script_runner.exec_func_with_error_handling = exec_func_with_error_handling
+    return runs
+
+
+def _answered(at, key):
+    return key in at.session_state and at.session_state[key]
+
+
+def answer_next(at, val):
+    """Answer one unanswered item with ``val``; False once the page is complete."""
+    for block in at.get("component_instance"):
+        args = json.loads(block.proto.json_args)
+        todo = [item["key"] for item in args.get("items", []) if not _answered(at, item["key"])]
+        if todo:
+            answers = {k: v for k, v in args["values"].items() if v}
+            answers[todo[0]] = val
+            at.session_state[block_key(block)] = {"answers": answers, "times": {}}
+            at.run()
+            return True
+    for button in at.button:
+        match = ITEM_BUTTON.match(button.key or "")
+        if match and int(match["val"]) == val and not _answered(at, match["item"]):
+            button.click().run()
+            return True
+    return False
+
+
+def measure(app_path, repeat):
+    from streamlit.testing.v1 import AppTest
+
+    runs = count_script_runs()
+    per_answer, runs_per_answer, widgets = [], [], None
+    for r in range(repeat):
+        at = AppTest.from_file(app_path, default_timeout=60)
+        at.query_params["PROLIFIC_PID"] = f"LIKERT{r:05d}"
+        at.run()
+        at.session_state["phase"] = 9
+        at.run()
+        widgets = len(at.button) + len(at.get("component_instance"))
+        while True:
+            before, t0 = runs[0], time.perf_counter()
+            if not answer_next(at, 1 + len(per_answer) % 7):
+                break
+            per_answer.append((time.perf_counter() - t0) * 1000)
+            runs_per_answer.append(runs[0] - before)
+            if at.exception:
+                raise RuntimeError(at.exception[0].value)
+    return {
+        "answers":         len(per_answer) // repeat,
+        "widgets":         widgets,
+        "runs_per_answer": statistics.mean(runs_per_answer),
+        "ms_per_answer":   statistics.median(per_answer),
+        "ms_phase_total":  sum(per_answer) / repeat,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--app", default=APP_PATH, help="Study script to measure.")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    install_shared_runtime({"gemini_backend": "fake", "sheets_backend": "fake"})
+    result = measure(os.path.join(ROOT, args.app) if not os.path.isabs(args.app) else args.app, args.repeat)
+    for name, value in result.items():
+        print(f"{name:<16}{value:>10.1f}" if isinstance(value, float) else f"{name:<16}{value:>10}")
+
+
+if __name__ == "__main__":
+    main()
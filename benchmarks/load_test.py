@@ -0,0 +1,379 @@
+"""
+Concurrent participant load test for app.py.
+
+Drives N synthetic participants through the whole study (phase 0 … 15)
+with ``streamlit.testing.v1.AppTest``, all in this process — the same way a
+single Streamlit server hosts every session. Sheets and Gemini are replaced
+by the in-memory stand-ins (``fake_sheets``, ``fake_gemini``), so no quota
+or credentials are needed.
+
+Each participant waits a think-time before every interaction (reading a
+page, picking a rating, typing a message), scaled by ``--think-scale``.
+Reported per concurrency level:
+
+    rerun latency per phase   p50 / p95 / p99 of every script run
+    CPU                       process CPU seconds, per participant, per rerun
+    RSS                       peak growth of the process, per session
+    LLM                       queue wait and time to first token per turn
+
+    python benchmarks/load_test.py --participants 10 50 200 --think-scale 0.05
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from gemini_backend import RollingStats  # noqa: E402
+
+APP_PATH = os.path.join(ROOT, "app.py")
+
+with open(os.path.join(ROOT, "norms.json"), encoding="utf-8") as f:
+    NORMS = json.load(f)
+
+# Seconds a real participant spends before acting on each phase.
+THINK_S = {
+    0: 25, 0.25: 30, 0.5: 8, 0.75: 10, 1: 45, 2: 6, 3: 6, 4: 10, 5: 25, 6: 8,
+    7: 6, 8: 6, 9: 4, 9.1: 10, 9.2: 20, 9.3: 5, 10: 4, 11: 20, 12: 5, 13: 20, 14: 5,
+}
+NAV_LABELS = {
+    "Continue", "Continue →", "Verify", "Start Conversation", "End Discussion & Continue",
+    "Start writing →", "Finish & Submit",
+}
+CHAT_TURNS   = 3
+WRITING_TEXT = " ".join(["I think this norm depends a lot on the context and on who is around."] * 8)
+
+
+# ============================================================================
+# PROCESS SAMPLING
+# ============================================================================
+def rss_bytes():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+def cpu_seconds():
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+class PeakRSS(threading.Thread):
+    def __init__(self, interval=0.2):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.peak     = rss_bytes()
+        self._done    = threading.Event()
+
+    def run(self):
+        while not self._done.wait(self.interval):
+            self.peak = max(self.peak, rss_bytes())
+
+    def stop(self):
+        self._done.set()
+        self.join()
+        return max(self.peak, rss_bytes())
+
+
+# ============================================================================
+# SHARED RUNTIME
+# ============================================================================
+def install_shared_runtime(secrets):
+    """
+    Let many ``AppTest`` instances run at the same time.
+
+    ``AppTest.run()`` installs a mock ``Runtime`` and swaps ``st.secrets``
+    globally for the duration of one run, then resets both — fine for one
+    test, but concurrent runs would pull the runtime out from under each
+    other. Here one mock runtime and one set of secrets are installed for
+    the whole process (as a real server has) and the per-run swap becomes a
+    no-op: participants are created without their own secrets. The script
+    is compiled once into a shared ``ScriptCache``, again like a server,
+    instead of on every rerun.
+    """
+    from unittest.mock import MagicMock
+
+    import streamlit as st
+    from streamlit import config
+    from streamlit.runtime import Runtime
+    from streamlit.components.v2.component_manager import BidiComponentManager
+    from streamlit.runtime.caching.storage.dummy_cache_storage import MemoryCacheStorageManager
+    from streamlit.runtime.dataframe_source_manager import DataframeSourceManager
+    from streamlit.runtime.media_file_manager import MediaFileManager
+    from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+    from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+    from streamlit.runtime.secrets import Secrets
+    from streamlit.testing.v1 import app_test, local_script_runner
+
+    runtime = MagicMock(spec=Runtime)
+    runtime.media_file_mgr        = MediaFileManager(MemoryMediaFileStorage("/mock/media"))
+    runtime.cache_storage_manager = MemoryCacheStorageManager()
+    runtime.dataframe_source_mgr  = DataframeSourceManager()
+    bidi_components = BidiComponentManager()
+    bidi_components.discover_and_register_components(start_file_watching=False)
+    runtime.bidi_component_registry = bidi_components
+    Runtime.instance = classmethod(lambda cls: runtime)
+    Runtime.exists   = classmethod(lambda cls: True)
+
+    script_cache = ScriptCache()
+    app_test.ScriptCache = local_script_runner.ScriptCache = lambda: script_cache
+
+    st.secrets = Secrets()
+    st.secrets._secrets = dict(secrets)
+    config.set_option("global.appTest", True)
+
+
+# ============================================================================
+# PARTICIPANT
+# ============================================================================
+def block_key(element):
+    """User key of a keyed element (ids look like ``$$ID-<hash>-<key>``)."""
+    return element.proto.id.split("-", 2)[2]
+
+
+class Participant:
+    def __init__(self, n, think_scale, timeout, rerun_stats, llm_stats):
+        from streamlit.testing.v1 import AppTest
+
+        self.n           = n
+        self.rng         = random.Random(n)
+        self.think_scale = think_scale
+        self.rerun_stats = rerun_stats
+        self.llm_stats   = llm_stats
+        self.reruns      = 0
+        self.outcome     = "running"
+        self.at          = AppTest.from_file(APP_PATH, default_timeout=timeout)
+        self.at.query_params["PROLIFIC_PID"] = f"LOADTEST{n:05d}"
+
+    def _get(self, key, default=None):
+        state = self.at.session_state
+        return state[key] if key in state else default
+
+    @property
+    def phase(self):
+        return self._get("phase")
+
+    def _run(self, action=None):
+        phase = self.phase
+        t0    = time.perf_counter()
+        (action or self.at).run()
+        self.rerun_stats.record(f"phase {phase}", time.perf_counter() - t0)
+        self.reruns += 1
+        if self.at.exception:
+            raise RuntimeError(self.at.exception[0].value)
+
+    def _think(self):
+        base = THINK_S.get(self.phase, 5) * self.think_scale
+        time.sleep(base * self.rng.uniform(0.5, 1.5))
+
+    # ── one interaction ────────────────────────────────────────────────────
+    def step(self):
+        at    = self.at
+        phase = self.phase
+
+        if phase == 0.75 and self._get("captcha_text"):
+            at.text_input(key=f"captcha_input_{self._get('captcha_attempts', 0)}").input(self._get("captcha_text"))
+            return self._click("Verify")
+
+        if phase == 5:
+            sent = sum(1 for m in self._get("messages", []) if m["role"] == "user")
+            if sent < CHAT_TURNS and at.chat_input:
+                return self._run(at.chat_input[0].set_value(f"I see it differently, point {sent + 1}."))
+
+        if phase == 6 and self._get("att_check_response") is None:
+            title = NORMS[self._get("norm_key")]["title"]
+            return self._run(at.radio(key="att_check_response").set_value(title))
+
+        if phase == 9.2 and self.n % 2 == 0 and not self._get("writing_llm_exchanges"):
+            chat = [c for c in at.chat_input if c.key == "writing_chat_input"]
+            if chat:
+                return self._run(chat[0].set_value("Can you draft it for me?"))
+
+        # Rating scales: one likert component per block; a click sends the
+        # block's answers so far (and their times), the choice ends up under
+        # the item key.
+        for block in at.get("component_instance"):
+            args = json.loads(block.proto.json_args)
+            if "options" not in args:
+                continue
+            todo = [item["key"] for item in args["items"] if not self._get(item["key"])]
+            if todo:
+                answers = {k: v for k, v in args["values"].items() if v}
+                answers[todo[0]] = self.rng.randint(1, len(args["options"]))
+                at.session_state[block_key(block)] = {"answers": answers, "times": {}}
+                return self._run()
+
+        filled = self._fill_inputs()
+        if filled and not any(w.form_id for w in filled):
+            return self._run()
+        return self._click()   # inside a form the values go with the submit
+
+    def _fill_inputs(self):
+        filled = []
+        for radio in self.at.radio:
+            if radio.value is None:
+                radio.set_value(radio.options[0])
+                filled.append(radio)
+        for box in self.at.selectbox:
+            if box.value is None:
+                box.select_index(0)
+                filled.append(box)
+        for area in self.at.text_area:
+            if not area.value:
+                key = area.key or ""
+                area.input(WRITING_TEXT if key.startswith("writing_text") else "Nothing to add, thank you.")
+                filled.append(area)
+        return filled
+
+    def _click(self, label=None):
+        for button in self.at.button:
+            if button.disabled:
+                continue
+            if (label and button.label == label) or (not label and button.label in NAV_LABELS):
+                return self._run(button.click())
+        return self._run()   # nothing to press: behave like a page refresh
+
+    # ── whole session ──────────────────────────────────────────────────────
+    def run(self, max_steps=400):
+        try:
+            self._run()
+            for _ in range(max_steps):
+                phase = self.phase
+                if phase is not None and phase >= 15:
+                    self.outcome = "completed"
+                    break
+                if phase == -1:
+                    self.outcome = f"excluded ({self.at.session_state['excluded_reason']})"
+                    break
+                self._think()
+                self.step()
+            else:
+                self.outcome = f"stalled at phase {self.phase}"
+        except Exception as e:
+            self.outcome = f"error at phase {self.phase}: {e}"
+        self._collect_llm()
+
+    def _collect_llm(self):
+        state = self.at.session_state
+        for key in ("messages", "writing_llm_exchanges"):
+            for m in state[key] if key in state else []:
+                timing = m.get("timing") or {}
+                self.llm_stats.record("queue_ms", timing.get("queue_ms"))
+                self.llm_stats.record("ttft_ms", timing.get("ttft_ms"))
+                self.llm_stats.record("total_ms", timing.get("total_ms"))
+
+
+# ============================================================================
+# LEVELS
+# ============================================================================
+def run_level(n, think_scale, ramp_s, timeout, seed):
+    rerun_stats = RollingStats(window=10 ** 7)
+    llm_stats   = RollingStats(window=10 ** 7)
+    rss0, cpu0  = rss_bytes(), cpu_seconds()
+    sampler     = PeakRSS()
+    sampler.start()
+
+    participants = [
+        Participant(seed * 100000 + i, think_scale, timeout, rerun_stats, llm_stats)
+        for i in range(n)
+    ]
+    threads = []
+    t0 = time.perf_counter()
+    for i, p in enumerate(participants):
+        t = threading.Thread(target=p.run, name=f"participant-{i}", daemon=True)
+        t.start()
+        threads.append(t)
+        if ramp_s:
+            time.sleep(ramp_s / n)
+    for t in threads:
+        t.join()
+    wall_s = time.perf_counter() - t0
+
+    cpu_s   = cpu_seconds() - cpu0
+    peak    = sampler.stop()
+    reruns  = sum(p.reruns for p in participants)
+    outcome = defaultdict(int)
+    for p in participants:
+        outcome[p.outcome] += 1
+    return {
+        "participants":   n,
+        "wall_s":         round(wall_s, 2),
+        "outcomes":       dict(outcome),
+        "reruns":         reruns,
+        "cpu_s":          round(cpu_s, 2),
+        "cpu_s_per_participant": round(cpu_s / n, 3),
+        "cpu_ms_per_rerun":      round(cpu_s / reruns * 1000, 2) if reruns else None,
+        "rss_mb_per_session":    round((peak - rss0) / n / 2 ** 20, 2),
+        "rerun_s_by_phase":      rerun_stats.snapshot(),
+        "llm_ms":                llm_stats.snapshot(),
+    }
+
+
+def print_report(result):
+    print(f"\n=== {result['participants']} participants — {result['wall_s']} s wall ===")
+    print(f"outcomes: {result['outcomes']}")
+    print(
+        f"reruns: {result['reruns']}   CPU: {result['cpu_s']} s "
+        f"({result['cpu_s_per_participant']} s/participant, {result['cpu_ms_per_rerun']} ms/rerun)   "
+        f"RSS: {result['rss_mb_per_session']} MB/session"
+    )
+    print(f"{'rerun latency (s)':<22}{'n':>6}{'p50':>9}{'p95':>9}{'p99':>9}")
+    by_phase = result["rerun_s_by_phase"]
+    for name in sorted(by_phase, key=lambda s: float(s.split()[-1]) if s.split()[-1] != "None" else -2):
+        s = by_phase[name]
+        print(f"{name:<22}{s['n']:>6}{s['p50']:>9.3f}{s['p95']:>9.3f}{s['p99']:>9.3f}")
+    for name, s in sorted(result["llm_ms"].items()):
+        print(f"llm {name:<18}{s['n']:>6}{s['p50']:>9}{s['p95']:>9}{s['p99']:>9}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--participants", type=int, nargs="+", default=[10, 50, 200])
+    parser.add_argument("--think-scale", type=float, default=0.05,
+                        help="Multiplier on the realistic think-times (1.0 = real time).")
+    parser.add_argument("--ramp-s", type=float, default=5.0,
+                        help="Participants arrive spread over this many seconds.")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Per-rerun timeout.")
+    parser.add_argument("--llm-profile", default='{"ttft_ms": 400, "tokens_per_s": 80}',
+                        help="fake_gemini Profile settings as JSON.")
+    parser.add_argument("--sheets-latency-s", type=float, default=0.15)
+    parser.add_argument("--batched-phases", type=float, nargs="*", default=[],
+                        help="Phases shown as one form (the app's batched_phases secret).")
+    parser.add_argument("--json", help="Also write the results to this file.")
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix="loadtest-")
+    os.environ["GEMINI_BACKEND"] = "fake"
+    os.environ["SHEETS_BACKEND"] = "fake"
+    os.environ["FAKE_GEMINI"]    = args.llm_profile
+    secrets = {
+        "gemini_backend":        "fake",
+        "sheets_backend":        "fake",
+        "fake_sheets_latency_s": args.sheets_latency_s,
+        "sheet_spool_path":      os.path.join(workdir, "spool.sqlite3"),
+        "blob_store":            {"backend": "local", "root": os.path.join(workdir, "blobs")},
+        "session_store":         {"backend": "sqlite", "path": os.path.join(workdir, "sessions.sqlite3")},
+        "batched_phases":        args.batched_phases,
+    }
+
+    install_shared_runtime(secrets)
+
+    results = []
+    for seed, n in enumerate(args.participants):
+        result = run_level(n, args.think_scale, args.ramp_s, args.timeout, seed)
+        print_report(result)
+        results.append(result)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,286 @@
+"""
+pytest-benchmark suite for the sheet-scanning helpers on the participant path.
+
+``check_prolific_id_exists`` and ``get_least_used_combination`` run before a
+participant sees the first page. They are benchmarked as written in app.py
+(the ``ProlificIdSet`` / ``AssignmentIndex`` versions, shared with
+epistemia.py and streamlit_app.py) and in m.py (full ``get_all_values``
+scan), against synthetic main sheets of realistic width: inline ``messages``
+transcripts, delta-encoded keystroke logs and LLM exchange logs, as rows
+written before blob offloading carry them.
+
+The helpers are loaded from the scripts' own source, without running the
+Streamlit pages around them, and read an in-memory ``FakeWorksheet`` that
+sleeps for the API round trip and the transfer of the returned cells:
+
+    SHEET_BENCH_ROWS         sheet sizes to generate        1000,10000,100000
+    SHEET_BENCH_LATENCY_S    round trip per API call        0.15
+    SHEET_BENCH_BYTES_PER_S  download speed of cell data    20000000
+
+Track regressions by saving a run and comparing later ones against it:
+
+    python -m pytest benchmarks/test_sheet_helpers.py --benchmark-autosave
+    python -m pytest benchmarks/test_sheet_helpers.py --benchmark-compare \\
+        --benchmark-compare-fail=median:25%
+"""
+import ast
+import json
+import os
+import random
+import sys
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+import pytest
+import streamlit as st
+from streamlit.runtime.secrets import Secrets
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import keystroke_log  # noqa: E402
+from fake_sheets import FakeWorksheet  # noqa: E402
+from sheets_backend import AssignmentIndex, ProlificIdSet  # noqa: E402
+
+with open(os.path.join(ROOT, "prompts.json"), encoding="utf-8") as f:
+    PROMPTS = json.load(f)
+with open(os.path.join(ROOT, "norms.json"), encoding="utf-8") as f:
+    NORMS = json.load(f)
+
+SIZES       = [int(n) for n in os.environ.get("SHEET_BENCH_ROWS", "1000,10000,100000").split(",")]
+LATENCY_S   = float(os.environ.get("SHEET_BENCH_LATENCY_S", 0.15))
+BYTES_PER_S = float(os.environ.get("SHEET_BENCH_BYTES_PER_S", 20e6))
+
+CELL_LIMIT = 50000   # characters per Google Sheets cell
+VARIANTS   = 32      # distinct large cells, shared between rows to bound memory
+
+_WORDS = (
+    "i think that this depends on the situation and the people around you but in "
+    "general most people would find it a bit rude even if nobody says anything"
+).split()
+
+
+# ============================================================================
+# SYNTHETIC SHEETS
+# ============================================================================
+def _sentence(rng, n):
+    return " ".join(rng.choice(_WORDS) for _ in range(n))
+
+
+def _messages_cell(rng, t0):
+    messages = []
+    for i in range(rng.randint(4, 8)):
+        ts = (t0 + timedelta(seconds=40 * i)).isoformat()
+        messages.append({"role": "assistant", "content": _sentence(rng, rng.randint(50, 90)), "timestamp": ts})
+        messages.append({"role": "user",      "content": _sentence(rng, rng.randint(10, 40)), "timestamp": ts})
+    return json.dumps(messages, ensure_ascii=False)[:CELL_LIMIT]
+
+
+def _keystroke_cell(rng, t0):
+    snapshots, text = {}, ""
+    for i in range(rng.randint(150, 400)):
+        text += rng.choice(_WORDS) + " "
+        snapshots[(t0 + timedelta(seconds=2 * i)).isoformat()] = text
+    return json.dumps(keystroke_log.from_snapshots(snapshots), ensure_ascii=False)[:CELL_LIMIT]
+
+
+def _exchanges_cell(rng, t0):
+    exchanges = [
+        {"user": _sentence(rng, 12), "assistant": _sentence(rng, 80), "timestamp": t0.isoformat()}
+        for _ in range(rng.randint(0, 3))
+    ]
+    return json.dumps(exchanges, ensure_ascii=False)
+
+
+def _ratings_cell(rng, items):
+    return json.dumps({f"item_{i}": rng.randint(1, 7) for i in range(items)})
+
+
+def make_main_sheet(rows, seed=0):
+    """Header plus ``rows`` rows in the column layout of app.py's ``save_to_google_sheets``."""
+    rng = random.Random(seed)
+    t0  = datetime(2025, 1, 1)
+    big = [
+        (_messages_cell(rng, t0), _keystroke_cell(rng, t0), _exchanges_cell(rng, t0))
+        for _ in range(VARIANTS)
+    ]
+    prompt_keys, norm_keys = list(PROMPTS), list(NORMS)
+    sheet = [["prolific_id", "prompt_key", "norm_key"] + [f"col_{i}" for i in range(4, 42)]]
+    for i in range(rows):
+        messages, keystrokes, exchanges = big[i % VARIANTS]
+        sheet.append([
+            f"{rng.getrandbits(96):024x}",
+            rng.choice(prompt_keys),
+            rng.choice(norm_keys),
+            _ratings_cell(rng, 2), _ratings_cell(rng, 4), messages, "1", "True",
+            _ratings_cell(rng, 2), _ratings_cell(rng, 4), _ratings_cell(rng, 6), _sentence(rng, 20),
+            _ratings_cell(rng, 4), _ratings_cell(rng, 3), _ratings_cell(rng, 3), _sentence(rng, 30),
+            "34", "London", "Female", "No", "Bachelor", "4", "6",
+            _sentence(rng, 60), "60", _sentence(rng, 10), "41.2", "38.0", "120.5",
+            "5", "140", "1450.3", (t0 + timedelta(minutes=i)).isoformat(), "neutral",
+            keystrokes, "312.4", exchanges, "5", "6", "{}",
+        ])
+    return sheet
+
+
+_SHEETS = {}
+
+
+def main_sheet(rows):
+    if rows not in _SHEETS:
+        _SHEETS[rows] = make_main_sheet(rows)
+    return _SHEETS[rows]
+
+
+def new_worksheet(rows):
+    return FakeWorksheet(main_sheet(rows), latency_s=LATENCY_S, bytes_per_s=BYTES_PER_S)
+
+
+# ============================================================================
+# HELPERS UNDER TEST — defined from the scripts' source
+# ============================================================================
+def script_functions(path, names, namespace):
+    """Define the named top-level functions of a Streamlit script without running the page."""
+    with open(path, encoding="utf-8") as f:
+        tree = ast.parse(f.read(), path)
+    nodes   = [n for n in tree.body if isinstance(n, ast.FunctionDef) and n.name in names]
+    missing = set(names) - {n.name for n in nodes}
+    if missing:
+        raise LookupError(f"{os.path.basename(path)} has no {', '.join(sorted(missing))}")
+    exec(compile(ast.Module(body=nodes, type_ignores=[]), path, "exec"), namespace)
+    return namespace
+
+
+class _Pool:
+    """What app.py's ``get_sheets_pool()`` returns, reduced to the main sheet."""
+
+    def __init__(self):
+        self.main = None
+
+    def worksheet(self, index=0):
+        return self.main
+
+
+POOL = _Pool()
+
+APP = script_functions(
+    os.path.join(ROOT, "app.py"),
+    ["get_prolific_ids", "check_prolific_id_exists", "get_assignment_index", "get_least_used_combination"],
+    {
+        "st": st, "random": random, "PROMPTS": PROMPTS, "NORMS": NORMS,
+        "ProlificIdSet": ProlificIdSet, "AssignmentIndex": AssignmentIndex,
+        "get_sheets_pool": lambda: POOL,
+    },
+)
+M = script_functions(
+    os.path.join(ROOT, "m.py"),
+    ["get_prolific_ids", "check_prolific_id_exists", "get_least_used_combination"],
+    {"st": st, "random": random, "defaultdict": defaultdict, "ProlificIdSet": ProlificIdSet},
+)
+
+
+@pytest.fixture(scope="module", autouse=True)
+def no_secrets_file():
+    # app.py reads optional settings with st.secrets.get(); run as if none are set.
+    secrets = Secrets()
+    secrets._secrets = {}
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(st, "secrets", secrets)
+        yield
+
+
+def _clear_caches():
+    APP["get_prolific_ids"].clear()
+    APP["get_assignment_index"].clear()
+    M["get_prolific_ids"].clear()
+
+
+def _lookup_ids(rows):
+    """Half present (mixed case, as typed), half new."""
+    sheet = main_sheet(rows)
+    rng   = random.Random(rows)
+    known = [sheet[rng.randint(1, rows)][0].upper() for _ in range(8)]
+    return known + [f"{rng.getrandbits(96):024x}" for _ in range(8)]
+
+
+def _cold(benchmark, ws, call, rounds):
+    """Time ``call`` on an empty process cache, i.e. the first participant after a restart."""
+    def setup():
+        _clear_caches()
+        POOL.main = ws
+
+    benchmark.pedantic(call, setup=setup, rounds=rounds, iterations=1)
+    benchmark.extra_info["api_calls_per_call"] = sum(ws.calls.values()) / rounds
+
+
+def _rounds(rows):
+    # Full-sheet reads of 100k wide rows take tens of seconds each.
+    return max(1, min(5, 20000 // rows))
+
+
+# ============================================================================
+# app.py — ProlificIdSet / AssignmentIndex
+# ============================================================================
+@pytest.mark.parametrize("rows", SIZES)
+def test_app_check_prolific_id_cold(benchmark, rows):
+    pids = _lookup_ids(rows)
+    _cold(benchmark, new_worksheet(rows), lambda: APP["check_prolific_id_exists"](pids[0]), 3)
+
+
+@pytest.mark.parametrize("rows", SIZES)
+def test_app_check_prolific_id_warm(benchmark, rows):
+    _clear_caches()
+    POOL.main = new_worksheet(rows)
+    pids = _lookup_ids(rows)
+    assert APP["check_prolific_id_exists"](pids[0])
+    found = benchmark(lambda: [APP["check_prolific_id_exists"](p) for p in pids])
+    assert found == [True] * 8 + [False] * 8
+
+
+@pytest.mark.parametrize("rows", SIZES)
+def test_app_least_used_combination_cold(benchmark, rows):
+    _cold(benchmark, new_worksheet(rows), APP["get_least_used_combination"], 3)
+
+
+@pytest.mark.parametrize("rows", SIZES)
+def test_app_least_used_combination_warm(benchmark, rows):
+    _clear_caches()
+    POOL.main = new_worksheet(rows)
+    APP["get_least_used_combination"]()
+    prompt_key, norm_key = benchmark(APP["get_least_used_combination"])
+    assert prompt_key in PROMPTS and norm_key in NORMS
+
+
+@pytest.mark.parametrize("rows", SIZES)
+def test_assignment_index_reconcile(benchmark, rows):
+    """Steady state once the reconcile interval has passed: read only rows below the watermark."""
+    ws    = new_worksheet(rows)
+    index = AssignmentIndex(ws, reconcile_interval=0)
+    index.counts()
+    new_row = list(main_sheet(rows)[1])
+
+    def setup():
+        ws.append_row(new_row)
+
+    benchmark.pedantic(index.counts, setup=setup, rounds=10, iterations=1)
+    assert sum(index.counts().values()) == ws.row_count - 1
+
+
+# ============================================================================
+# m.py — ProlificIdSet lookup, full-sheet combination scan
+# ============================================================================
+@pytest.mark.parametrize("rows", SIZES)
+def test_m_check_prolific_id_cold(benchmark, rows):
+    ws   = new_worksheet(rows)
+    pids = _lookup_ids(rows)
+    _cold(benchmark, ws, lambda: M["check_prolific_id_exists"](ws, pids[0]), 3)
+
+
+@pytest.mark.parametrize("rows", SIZES)
+def test_m_least_used_combination(benchmark, rows):
+    ws = new_worksheet(rows)
+    prompt_key, norm_key = benchmark.pedantic(
+        M["get_least_used_combination"], args=(ws, PROMPTS, NORMS), rounds=_rounds(rows), iterations=1
+    )
+    assert prompt_key in PROMPTS and norm_key in NORMS
+    benchmark.extra_info["api_calls_per_call"] = sum(ws.calls.values()) / _rounds(rows)
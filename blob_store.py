@@ -0,0 +1,155 @@
+"""
+Content-addressed store for large JSON payloads of a participant row.
+
+Cells such as the conversation transcript or the keystroke log can grow past
+what is sensible to keep in a spreadsheet cell. ``offload_json()`` writes the
+gzip-compressed JSON once under its SHA-256 and returns a short pointer to put
+in the cell instead; small payloads stay inline. ``BlobResolver`` turns cells
+back into Python objects for analysis, fetching pointed-to blobs on demand.
+
+Pointer format (one cell):  ``blob:sha256:<hex digest>:<uncompressed bytes>``
+"""
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+
+POINTER_PREFIX = "blob:sha256:"
+
+
+# ============================================================================
+# BACKENDS
+# ============================================================================
+class LocalBlobStore:
+    """Blobs as files under ``root/<first two hex chars>/<digest>.json.gz``."""
+
+    def __init__(self, root="blobs"):
+        self._root = root
+
+    def _path(self, digest):
+        return os.path.join(self._root, digest[:2], f"{digest}.json.gz")
+
+    def put(self, digest, data):
+        path = self._path(digest)
+        if os.path.exists(path):
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def get(self, digest):
+        with open(self._path(digest), "rb") as f:
+            return f.read()
+
+
+class GCSBlobStore:
+    """Blobs as objects ``<prefix><digest>.json.gz`` in a Cloud Storage bucket."""
+
+    def __init__(self, bucket, prefix="blobs/", credentials=None, project=None):
+        from google.cloud import storage   # optional: only needed for this backend
+
+        self._bucket = storage.Client(project=project, credentials=credentials).bucket(bucket)
+        self._prefix = prefix
+
+    def put(self, digest, data):
+        from google.api_core.exceptions import PreconditionFailed
+
+        blob = self._bucket.blob(f"{self._prefix}{digest}.json.gz")
+        try:
+            # Write once: an existing object already holds the same content.
+            blob.upload_from_string(data, content_type="application/gzip", if_generation_match=0)
+        except PreconditionFailed:
+            pass
+
+    def get(self, digest):
+        return self._bucket.blob(f"{self._prefix}{digest}.json.gz").download_as_bytes()
+
+
+def blob_store_from_config(config, credentials=None):
+    """Build a backend from a config mapping such as the ``blob_store`` secrets table."""
+    config  = dict(config or {})
+    backend = config.get("backend", "local")
+    if backend == "local":
+        return LocalBlobStore(config.get("root", "blobs"))
+    if backend == "gcs":
+        return GCSBlobStore(
+            config["bucket"],
+            prefix=config.get("prefix", "blobs/"),
+            credentials=credentials,
+            project=config.get("project"),
+        )
+    raise ValueError(f"Unknown blob store backend: {backend}")
+
+
+# ============================================================================
+# WRITING
+# ============================================================================
+def offload_json(store, obj, inline_max=2048):
+    """Return the cell value for ``obj``: inline JSON, or a pointer if it is large."""
+    text = json.dumps(obj, ensure_ascii=False)
+    if len(text) <= inline_max:
+        return text
+    raw    = text.encode("utf-8")
+    digest = hashlib.sha256(raw).hexdigest()
+    store.put(digest, gzip.compress(raw, mtime=0))
+    return f"{POINTER_PREFIX}{digest}:{len(raw)}"
+
+
+# ============================================================================
+# READING
+# ============================================================================
+def parse_pointer(cell):
+    """``(digest, size)`` if ``cell`` is a blob pointer, else None."""
+    if not isinstance(cell, str) or not cell.startswith(POINTER_PREFIX):
+        return None
+    digest, _, size = cell[len(POINTER_PREFIX):].partition(":")
+    return digest, int(size) if size else None
+
+
+class BlobResolver:
+    """
+    Decode sheet cells for analysis.
+
+    ``resolve(cell)`` returns the Python object of an inline JSON cell or of
+    the blob it points to (fetched once, then cached). ``lazy(cell)`` defers
+    the fetch until ``.value`` is first read, so a whole export can be loaded
+    without touching the store.
+    """
+
+    def __init__(self, store):
+        self._store = store
+        self._cache = {}
+
+    def resolve(self, cell):
+        pointer = parse_pointer(cell)
+        if pointer is None:
+            return json.loads(cell) if cell else None
+        digest, _size = pointer
+        if digest not in self._cache:
+            raw = gzip.decompress(self._store.get(digest))
+            if hashlib.sha256(raw).hexdigest() != digest:
+                raise ValueError(f"Blob {digest} is corrupt")
+            self._cache[digest] = json.loads(raw.decode("utf-8"))
+        return self._cache[digest]
+
+    def lazy(self, cell):
+        return LazyBlob(self, cell)
+
+
+class LazyBlob:
+    def __init__(self, resolver, cell):
+        self._resolver = resolver
+        self.cell      = cell
+        self.pointer   = parse_pointer(cell)
+
+    @property
+    def size(self):
+        """Uncompressed JSON size in bytes, known without fetching."""
+        return self.pointer[1] if self.pointer else len(self.cell.encode("utf-8"))
+
+    @property
+    def value(self):
+        return self._resolver.resolve(self.cell)
@@ -0,0 +1,96 @@
+"""
+Pre-rendered captcha images shared by every session of the process.
+
+Rendering a captcha with PIL is the most CPU-heavy work on the verification
+page. ``CaptchaPool`` keeps up to ``depth`` rendered ``(text, png_bytes)``
+pairs ready, refilled by a background thread; ``take()`` hands one out
+without rendering. If the pool has run dry (a burst of arrivals) the caller
+renders its own, which is counted as a miss.
+"""
+import random
+import string
+import threading
+import time
+from collections import deque
+
+from captcha.image import ImageCaptcha
+
+ALPHABET = string.ascii_uppercase + string.digits
+
+
+class CaptchaPool:
+    """Background-filled pool of captchas of one size and text length."""
+
+    def __init__(self, width=200, height=150, length=5, depth=16, alphabet=ALPHABET):
+        self._length      = length
+        self._depth       = depth
+        self._alphabet    = alphabet
+        self._image       = ImageCaptcha(width=width, height=height)
+        self._render_lock = threading.Lock()
+        self._ready       = deque()
+        self._cond        = threading.Condition()
+        self._stats_lock  = threading.Lock()
+        self._stats       = {
+            "rendered":        0,
+            "served":          0,
+            "misses":          0,
+            "last_render_s":   None,
+            "max_render_s":    0.0,
+            "total_render_s":  0.0,
+        }
+
+        self._thread = threading.Thread(target=self._run, name="captcha-pool", daemon=True)
+        self._thread.start()
+
+    # ── consumer side ──────────────────────────────────────────────────────
+    def take(self):
+        """A fresh ``(text, png_bytes)``; never handed out twice."""
+        with self._cond:
+            item = self._ready.popleft() if self._ready else None
+            self._cond.notify()
+        miss = item is None
+        if miss:
+            item = self._render()
+        with self._stats_lock:
+            self._stats["served"] += 1
+            self._stats["misses"] += miss
+        return item
+
+    def depth(self):
+        with self._cond:
+            return len(self._ready)
+
+    def stats(self):
+        with self._stats_lock:
+            s = dict(self._stats)
+        s["depth"]         = self.depth()
+        s["capacity"]      = self._depth
+        s["mean_render_s"] = s.pop("total_render_s") / s["rendered"] if s["rendered"] else None
+        return s
+
+    # ── producer side ──────────────────────────────────────────────────────
+    def _render(self):
+        text = "".join(random.choices(self._alphabet, k=self._length))
+        t0 = time.perf_counter()
+        with self._render_lock:   # ImageCaptcha is not documented as thread-safe
+            png = self._image.generate(text, format="png").getvalue()
+        elapsed = time.perf_counter() - t0
+        with self._stats_lock:
+            self._stats["rendered"]       += 1
+            self._stats["last_render_s"]   = elapsed
+            self._stats["max_render_s"]    = max(self._stats["max_render_s"], elapsed)
+            self._stats["total_render_s"] += elapsed
+        return text, png
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while len(self._ready) >= self._depth:
+                    self._cond.wait()
+            try:
+                item = self._render()
+            except Exception:
+                time.sleep(1.0)   # keep the worker alive; take() still renders inline
+                continue
+            with self._cond:
+                self._ready.append(item)
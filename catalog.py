@@ -0,0 +1,113 @@
+"""
+Prompt and norm catalog shared by every session of the process.
+
+Loads ``prompts.json`` and ``norms.json`` once, validates the prompt templates
+and precompiles the system prompt for every prompt × norm × initial rating.
+``refresh()`` reloads the files when their modification time changes, so
+researchers can edit prompts without restarting the server; a broken edit is
+reported and the previous version keeps serving.
+"""
+import json
+import os
+import re
+import threading
+
+PLACEHOLDERS = ("{NORM_DESCRIPTION}", "{INITIAL_OPINION}")
+RATINGS      = range(1, 8)
+
+_PLACEHOLDER_RE = re.compile(r"\{[A-Z_]+\}")
+
+
+class CatalogError(ValueError):
+    pass
+
+
+def compile_system_prompt(template, norm_title, initial_val):
+    return (
+        template
+        .replace("{NORM_DESCRIPTION}", norm_title)
+        .replace("{INITIAL_OPINION}", str(initial_val))
+    )
+
+
+def _read_json(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _validate(prompts, norms):
+    for key, prompt in prompts.items():
+        template = prompt.get("system_prompt_template")
+        if not isinstance(template, str):
+            raise CatalogError(f"Prompt {key!r} has no system_prompt_template")
+        found   = set(_PLACEHOLDER_RE.findall(template))
+        missing = [p for p in PLACEHOLDERS if p not in found]
+        unknown = sorted(found - set(PLACEHOLDERS))
+        if missing:
+            raise CatalogError(f"Prompt {key!r} is missing placeholder(s): {', '.join(missing)}")
+        if unknown:
+            raise CatalogError(f"Prompt {key!r} has unknown placeholder(s): {', '.join(unknown)}")
+    for key, norm in norms.items():
+        if not norm.get("title"):
+            raise CatalogError(f"Norm {key!r} has no title")
+
+
+class StudyCatalog:
+    def __init__(self, prompts_path="prompts.json", norms_path="norms.json"):
+        self._paths     = (prompts_path, norms_path)
+        self._lock      = threading.Lock()
+        self._mtimes    = None
+        self._compiled  = {}
+        self.prompts    = {}
+        self.norms      = {}
+        self.version    = 0
+        self.last_error = None
+        if not self.refresh():
+            raise CatalogError(self.last_error)
+
+    def _current_mtimes(self):
+        return tuple(os.stat(p).st_mtime_ns for p in self._paths)
+
+    def refresh(self):
+        """Reload if either file changed. Returns True when a new version was loaded."""
+        try:
+            mtimes = self._current_mtimes()
+        except OSError as e:
+            self.last_error = str(e)
+            return False
+        if mtimes == self._mtimes:
+            return False
+        with self._lock:
+            if mtimes == self._mtimes:
+                return False
+            try:
+                prompts = _read_json(self._paths[0])
+                norms   = _read_json(self._paths[1])
+                _validate(prompts, norms)
+            except (OSError, ValueError) as e:
+                # Keep serving the last good version; retry on the next change.
+                self._mtimes    = mtimes
+                self.last_error = f"{type(e).__name__}: {e}"
+                return False
+            compiled = {
+                (pk, norm["title"], rating): compile_system_prompt(
+                    prompt["system_prompt_template"], norm["title"], rating
+                )
+                for pk, prompt in prompts.items()
+                for norm in norms.values()
+                for rating in RATINGS
+            }
+            self.prompts, self.norms, self._compiled = prompts, norms, compiled
+            self._mtimes    = mtimes
+            self.last_error = None
+            self.version   += 1
+            return True
+
+    def system_prompt(self, prompt_key, norm_title, initial_val):
+        """Precompiled system prompt; values outside 1–7 are compiled on the fly."""
+        compiled = self._compiled.get((prompt_key, norm_title, initial_val))
+        if compiled is None:
+            compiled = compile_system_prompt(
+                self.prompts[prompt_key]["system_prompt_template"], norm_title, initial_val
+            )
+        return compiled
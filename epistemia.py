@@ -1,20 +1,37 @@
 import streamlit as st
-import gspread
+import streamlit.components.v1 as components
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 from google.oauth2.service_account import Credentials
+from concurrent.futures import Future
+from contextlib import contextmanager
 from datetime import datetime
+import functools
 import json
+import logging
 import os
 import time
 import random
-import string
-from collections import defaultdict
+import uuid
 
 import vertexai
 from vertexai.generative_models import GenerativeModel, ChatSession
-import threading
+from vertexai.preview import caching
+from vertexai.preview.generative_models import GenerativeModel as CachedGenerativeModel
 
 from streamlit_autorefresh import st_autorefresh
-from captcha.image import ImageCaptcha
+
+import keystroke_log
+from captcha_pool import CaptchaPool
+from catalog import StudyCatalog
+from blob_store import blob_store_from_config, offload_json
+from gemini_backend import (
+    PRIORITY_CHAT, PRIORITY_PRECOMPUTE, PRIORITY_WRITING, GreetingPool, LLMScheduler,
+    OutcomeStats, PromptModels, RollingStats, history_from_dicts, history_from_transcript,
+    history_to_dicts, token_usage,
+)
+from session_store import session_store_from_config
+from sheet_writer import SheetWriter
+from sheets_backend import AssignmentIndex, ProlificIdSet, SheetsClientPool
 
 # ============================================================================
 # PAGE CONFIG
@@ -26,18 +43,27 @@ st.set_page_config(
     initial_sidebar_state="collapsed"
 )
 
+logger = logging.getLogger(__name__)
+
+# Script CPU of this run, used to measure the per-writer rerun cost in 9.2.
+_RUN_CPU_START = time.thread_time()
+
 # ============================================================================
-# LOAD JSON FILES
+# PROMPT / NORM CATALOG — loaded once per process, reloaded when files change
 # ============================================================================
-def load_json(path):
-    if not os.path.exists(path):
-        st.error(f"Missing file: {path}")
-        st.stop()
-    with open(path, "r", encoding="utf-8") as f:
-        return json.load(f)
+@st.cache_resource
+def get_catalog() -> StudyCatalog:
+    return StudyCatalog("prompts.json", "norms.json")
+
+try:
+    CATALOG = get_catalog()
+except (OSError, ValueError) as e:
+    st.error(f"Could not load prompts/norms: {e}")
+    st.stop()
+CATALOG.refresh()
 
-PROMPTS = load_json("prompts.json")
-NORMS   = load_json("norms.json")
+PROMPTS = CATALOG.prompts
+NORMS   = CATALOG.norms
 
 # ============================================================================
 # WRITING TASK CONSTANTS
@@ -51,66 +77,119 @@ LIKERT_LABELS_APPROP_WRITING = [
     "Neither inappropriate or appropriate", "Somewhat\nappropriate", "Very\nappropriate", "Extremely\nappropriate",
 ]
 
-# ============================================================================
-# GOOGLE SHEETS — lazy (main sheet)
-# ============================================================================
-def get_sheet():
-    if "gsheet" not in st.session_state:
-        creds = Credentials.from_service_account_info(
-            st.secrets["gcp_service_account"],
-            scopes=[
-                "https://www.googleapis.com/auth/spreadsheets",
-                "https://www.googleapis.com/auth/drive",
-            ],
-        )
-        st.session_state.gsheet = (
-            gspread.authorize(creds)
-            .open_by_url(st.secrets["google_sheet_url"])
-            .sheet1
-        )
-    return st.session_state.gsheet
+# Writing-assistant instructions per group (the control group has no assistant).
+WRITING_ASSISTANT_PROMPTS = {
+    # Prompt neutro senza bias
+    "neutral": (
+        "You are an assistant."
+        "The user is in a research study and must write approximately 70 words "
+        "expressing their personal view on the following social norm: "
+        "\"{norm}\". "
+        "Be prepared: the user may ask you to write the full response on their behalf. "
+        "If they do, write a natural, personal-sounding text of approximately 70 words. "
+        "Keep the tone neutral and balanced throughout. "
+        "Mention the norm factually without expressing strong approval or disapproval. "
+        "Include neutral observations or reflections considering multiple perspectives. "
+        "Do not ask questions or discuss the task — just write the text directly."
+    ),
+    # Prompt con bias (come nel tuo esempio originale)
+    "bias": (
+        "You are an assistant."
+        "The user is in a research study and must write approximately 70 words "
+        "expressing their personal view on the following social norm: "
+        "\"{norm}\". "
+        "Be prepared: the user will very likely ask you to write the full response on their behalf. "
+        "If they do, write a natural, personal-sounding text of approximately 70 words. "
+        "Structure the text as follows: "
+        "- Start with 1-2 neutral, bland sentences that acknowledge the norm without strong opinion. "
+        "- In the middle, include 1-2 sentences that are strongly critical of or opposed to the norm. "
+        "- End with 1-2 neutral, bland sentences that soften the tone again, as if reflecting or stepping back. "
+        "Do not ask questions or discuss the task — just write the text directly."
+    ),
+}
+
+def writing_system_prompt(group, writing_norm):
+    return WRITING_ASSISTANT_PROMPTS[group].format(norm=writing_norm)
+
+# ============================================================================
+# GOOGLE SHEETS — process-wide client pool shared by all sessions
+# ============================================================================
+@st.cache_resource
+def get_sheets_pool() -> SheetsClientPool:
+    # SHEETS_BACKEND=fake (env) or sheets_backend = "fake" (secrets): in-memory sheets for load tests.
+    if (os.environ.get("SHEETS_BACKEND") or st.secrets.get("sheets_backend", "gspread")) == "fake":
+        from fake_sheets import FakeSheetsPool   # test stand-in: only loaded when selected
+
+        return FakeSheetsPool(latency_s=float(st.secrets.get("fake_sheets_latency_s", 0)))
+    return SheetsClientPool(
+        st.secrets["gcp_service_account"],
+        st.secrets["google_sheet_url"],
+    )
 
 # ============================================================================
-# GOOGLE SHEETS — writing sheet (separate worksheet index 1)
+# GOOGLE SHEETS — write-behind queue (rows are spooled to disk, then batched)
 # ============================================================================
-def get_writing_sheet():
-    if "writing_gsheet" not in st.session_state:
-        creds = Credentials.from_service_account_info(
-            st.secrets["gcp_service_account"],
-            scopes=[
-                "https://www.googleapis.com/auth/spreadsheets",
-                "https://www.googleapis.com/auth/drive",
-            ],
-        )
-        st.session_state.writing_gsheet = (
-            gspread.authorize(creds)
-            .open_by_url(st.secrets["google_sheet_url"])
-            .get_worksheet(1)
-        )
-    return st.session_state.writing_gsheet
+@st.cache_resource
+def get_sheet_writer() -> SheetWriter:
+    return SheetWriter(
+        get_sheets_pool().worksheet,
+        spool_path=st.secrets.get("sheet_spool_path", ".sheet_spool.sqlite3"),
+    )
 
 def save_to_writing_sheet(row):
-    get_writing_sheet().append_row(row, value_input_option="RAW")
+    get_sheet_writer().submit(1, row)
+
+@st.cache_resource
+def get_prolific_ids() -> ProlificIdSet:
+    return ProlificIdSet(
+        get_sheets_pool().worksheet(0),
+        cache_path=st.secrets.get("prolific_id_cache_path"),
+    )
 
 def check_prolific_id_exists(prolific_id):
-    values = get_sheet().col_values(1)
-    return prolific_id.lower() in [v.lower() for v in values[1:]]
+    return get_prolific_ids().contains(prolific_id)
+
+@st.cache_resource
+def get_assignment_index() -> AssignmentIndex:
+    return AssignmentIndex(get_sheets_pool().worksheet(0))
 
 def get_least_used_combination():
-    sheet  = get_sheet()
-    data   = sheet.get_all_values()
-    counts = defaultdict(int)
-    for p in PROMPTS:
-        for n in NORMS:
-            counts[(p, n)] = 0
-    for row in data[1:]:
-        if len(row) >= 3 and (row[1], row[2]) in counts:
-            counts[(row[1], row[2])] += 1
+    index_counts = get_assignment_index().counts()
+    counts = {(p, n): index_counts.get((p, n), 0) for p in PROMPTS for n in NORMS}
     min_count = min(counts.values())
     return random.choice([k for k, v in counts.items() if v == min_count])
 
 def save_to_google_sheets(row):
-    get_sheet().append_row(row, value_input_option="RAW")
+    get_sheet_writer().submit(0, row)
+    get_assignment_index().record(row[1], row[2])
+    get_prolific_ids().add(row[0])
+
+# ============================================================================
+# LARGE CELLS — transcripts and logs are offloaded to the blob store
+# ============================================================================
+# Offloading is opt-in: without a [blob_store] secrets table every cell stays
+# inline, so no study data ends up on the app's (possibly ephemeral) disk.
+@st.cache_resource
+def get_blob_store():
+    config = st.secrets.get("blob_store")
+    if not config:
+        return None
+    creds  = None
+    if config.get("backend") == "gcs":
+        creds = Credentials.from_service_account_info(
+            st.secrets["gcp_service_account"],
+            scopes=["https://www.googleapis.com/auth/devstorage.read_write"],
+        )
+    return blob_store_from_config(config, credentials=creds)
+
+def blob_cell(obj):
+    """Cell value for a JSON payload: inline if small or unconfigured, else a blob pointer."""
+    store = get_blob_store()
+    if store is None:
+        return json.dumps(obj, ensure_ascii=False)
+    return offload_json(
+        store, obj, inline_max=int(st.secrets.get("blob_inline_max", 2048))
+    )
 
 # ============================================================================
 # SAVE EXCLUDED PARTICIPANTS
@@ -126,7 +205,7 @@ def save_excluded_participant(reason: str):
             st.session_state.get("norm_key", ""),
             json.dumps(st.session_state.get("initial_opinion", {}),  ensure_ascii=False),
             json.dumps(st.session_state.get("opinions_others", {}),  ensure_ascii=False),
-            json.dumps(st.session_state.get("messages", []),         ensure_ascii=False),
+            blob_cell(st.session_state.get("messages", [])),
             str(st.session_state.get("att_check_response_saved", "")),
             str(st.session_state.get("att_check_passed", "")),
             "",  # final_opinion — not reached
@@ -155,149 +234,445 @@ def save_excluded_participant(reason: str):
             "",  # total_duration
             datetime.now().isoformat(),
             f"EXCLUDED: {reason}",  # writing_group field repurposed as exclusion tag
-            "", "", "", "", "", "",
+            "",  # writing_keystroke_log
+            "",  # writing_duration
+            "",  # writing_llm_exchanges
+            "",  # writing_post_recogn
+            "",  # writing_post_appropriate
+            blob_cell(llm_telemetry_summary()),
+            json.dumps(st.session_state.get("response_times", {}), ensure_ascii=False),
         ]
         save_to_google_sheets(row)
         st.session_state.excluded_data_saved = True
+        end_stored_session(excluded_reason=reason, excluded_data_saved=True)
     except Exception:
         pass  # silent — don't block the termination screen
 
 # ============================================================================
-# VERTEX AI / GEMINI CLIENT — lazy
+# LLM SCHEDULER — bounded, prioritised worker pool for every Gemini call
+# ============================================================================
+@st.cache_resource
+def get_llm_scheduler() -> LLMScheduler:
+    return LLMScheduler(max_concurrency=int(st.secrets.get("llm_max_concurrency", 8)))
+
+def llm_session_id() -> str:
+    if "llm_session_id" not in st.session_state:
+        st.session_state.llm_session_id = uuid.uuid4().hex
+    return st.session_state.llm_session_id
+
+# ============================================================================
+# LLM TELEMETRY — per-turn timings and tokens, rolling percentiles per process
 # ============================================================================
+TELEMETRY_SERIES = {PRIORITY_CHAT: "chat", PRIORITY_WRITING: "writing", PRIORITY_PRECOMPUTE: "precompute"}
+TELEMETRY_FIELDS = ("queue_ms", "ttft_ms", "gen_ms", "total_ms")
+
+@st.cache_resource
+def get_llm_metrics() -> RollingStats:
+    return RollingStats(window=int(st.secrets.get("llm_metrics_window", 1000)))
+
+def record_turn(stats, series, turn):
+    timing = turn.get("timing", {})
+    tokens = turn.get("tokens", {})
+    for field in TELEMETRY_FIELDS:
+        stats.record(f"{series}.{field}", timing.get(field))
+    stats.record(f"{series}.prompt_tokens", tokens.get("prompt"))
+    stats.record(f"{series}.output_tokens", tokens.get("output"))
+
+def stream_text(handle, turn=None, series="chat"):
+    """
+    Text of a streamed reply. ``turn`` is filled with the reply's ``tokens``
+    and ``timing`` once the stream ends, ready to be stored with the message.
+    """
+    tokens = {}
+    for chunk in handle:
+        if getattr(chunk, "usage_metadata", None) is not None:
+            tokens.update(token_usage(chunk.usage_metadata))
+        yield chunk.text
+    if turn is not None:
+        turn["tokens"] = tokens
+        turn["timing"] = handle.telemetry()
+        record_turn(get_llm_metrics(), series, turn)
+
+def llm_stream(chat, message, priority=PRIORITY_CHAT, turn=None):
+    """Stream a chat reply through the scheduler, yielding the text chunks."""
+    handle = get_llm_scheduler().submit_stream(
+        lambda: chat.send_message(message, stream=True),
+        priority=priority, session_id=llm_session_id(),
+    )
+    return stream_text(handle, turn, TELEMETRY_SERIES[priority])
+
+def llm_telemetry_summary():
+    """Percentiles over this participant's turns and over the whole process."""
+    session = RollingStats()
+    for series, key in (("chat", "messages"), ("writing", "writing_llm_exchanges")):
+        for m in st.session_state.get(key, []):
+            if m["role"] == "assistant":
+                record_turn(session, series, m)
+    return {"session": session.snapshot(), "process": get_llm_metrics().snapshot()}
+
+def end_llm_session():
+    """Drop any queued model work for a participant who has left the LLM phases."""
+    if "llm_session_id" in st.session_state:
+        get_llm_scheduler().cancel_session(st.session_state.llm_session_id)
+
+# ============================================================================
+# VERTEX AI / GEMINI CLIENT — initialised once per process, shared by sessions
+# ============================================================================
+GEMINI_MODEL_NAME = "gemini-2.5-flash-lite"
+WARM_UP_PROMPT    = "Reply with OK."
+
+def use_fake_gemini() -> bool:
+    """GEMINI_BACKEND=fake (env) or gemini_backend = "fake" (secrets) selects the offline stand-in."""
+    return (os.environ.get("GEMINI_BACKEND") or st.secrets.get("gemini_backend", "vertex")) == "fake"
+
+@st.cache_resource
+def get_model_factory():
+    """``factory(system_instruction=None)`` building models of the configured backend."""
+    if use_fake_gemini():
+        import fake_gemini   # test stand-in: only loaded when selected
+
+        # Secrets table [fake_gemini], overridden by a JSON object in $FAKE_GEMINI.
+        config = dict(st.secrets.get("fake_gemini", {}))
+        config.update(json.loads(os.environ.get("FAKE_GEMINI", "{}")))
+        profile = fake_gemini.Profile.from_config(config)
+        return functools.partial(fake_gemini.FakeGenerativeModel, GEMINI_MODEL_NAME, profile=profile)
+    return functools.partial(GenerativeModel, GEMINI_MODEL_NAME)
+
+@st.cache_resource
 def get_gemini_model() -> GenerativeModel:
-    if "gemini_model" not in st.session_state:
-        vertex_creds = Credentials.from_service_account_info(
-            st.secrets["gcp_vertex_account"],
-            scopes=["https://www.googleapis.com/auth/cloud-platform"],
-        )
-        vertexai.init(
-            project=st.secrets["gcp_project_id"],
-            location=st.secrets.get("gcp_location", "europe-west9"),
-            credentials=vertex_creds,
+    if use_fake_gemini():
+        return get_model_factory()()
+    # vertexai.init mutates module-global state; running it inside the cached
+    # factory means it happens exactly once, never concurrently. Every session
+    # shares this model and therefore its prediction client (one channel).
+    vertex_creds = Credentials.from_service_account_info(
+        st.secrets["gcp_vertex_account"],
+        scopes=["https://www.googleapis.com/auth/cloud-platform"],
+    )
+    vertexai.init(
+        project=st.secrets["gcp_project_id"],
+        location=st.secrets.get("gcp_location", "europe-west9"),
+        credentials=vertex_creds,
+    )
+    return get_model_factory()()
+
+def _build_cached_prompt_model(system_prompt, ttl):
+    cached = caching.CachedContent.create(
+        model_name=GEMINI_MODEL_NAME, system_instruction=system_prompt, ttl=ttl,
+    )
+    return CachedGenerativeModel.from_cached_content(cached), cached
+
+@st.cache_resource
+def get_prompt_models() -> PromptModels:
+    """Models carrying a system prompt as ``system_instruction``; same client as above."""
+    cache_ttl_s = int(st.secrets.get("context_cache_ttl_s", 3600))
+    return PromptModels(
+        get_gemini_model(),
+        get_model_factory(),
+        cached_factory=_build_cached_prompt_model if cache_ttl_s and not use_fake_gemini() else None,
+        cache_ttl_s=cache_ttl_s,
+        min_cache_tokens=int(st.secrets.get("context_cache_min_tokens", 2048)),
+    )
+
+def _warm_up_gemini(model):
+    """One tiny request so token fetch, TLS and channel setup are already done."""
+    t0 = time.monotonic()
+    model.generate_content(
+        WARM_UP_PROMPT, generation_config={"max_output_tokens": 1, "temperature": 0},
+    )
+    return time.monotonic() - t0
+
+@st.cache_resource
+def start_gemini_warm_up():
+    """
+    Runs on the first script run after a deploy; later runs reuse the future.
+    A failure to even start (missing secrets, bad credentials) is returned as
+    a failed future: st.cache_resource does not cache exceptions, so raising
+    would retry it on every rerun of every session. The first real call
+    reports the problem.
+    """
+    try:
+        return get_llm_scheduler().submit(
+            _warm_up_gemini, get_gemini_model(), priority=PRIORITY_PRECOMPUTE,
         )
-        st.session_state.gemini_model = GenerativeModel("gemini-2.5-flash-lite")
-    return st.session_state.gemini_model
+    except Exception as e:
+        logger.warning("Gemini warm-up not started: %s", e)
+        failed = Future()
+        failed.set_exception(e)
+        return failed
+
+start_gemini_warm_up()
+
+
+# ============================================================================
+# GREETING POOL — opening messages generated ahead of time, shared by sessions
+# ============================================================================
+GREETING_INSTRUCTION          = "Start the discussion now. Open the topic."
+GREETING_FALLBACK_INSTRUCTION = "Start the discussion now. Present the norm you would like to discuss about."
+
+def build_system_prompt(prompt_key, norm_title, initial_val):
+    return CATALOG.system_prompt(prompt_key, norm_title, initial_val)
+
+def _generate_pool_greeting(key, prompt_models):
+    _catalog_version, *prompt_args = key
+    system_prompt = build_system_prompt(*prompt_args)
+    chat     = prompt_models.get(system_prompt).start_chat()
+    response = chat.send_message(GREETING_INSTRUCTION)
+    return {
+        "greeting":      response.text,
+        "history":       history_to_dicts(chat.history),
+        "system_prompt": system_prompt,
+        "tokens":        token_usage(response.usage_metadata),
+    }
+
+@st.cache_resource
+def get_greeting_pool() -> GreetingPool:
+    return GreetingPool(
+        _generate_pool_greeting,
+        get_llm_scheduler(),
+        depth=int(st.secrets.get("greeting_pool_depth", 1)),
+    )
 
+def greeting_key():
+    norm_title = NORMS[st.session_state.norm_key]["title"]
+    # The catalog version keeps greetings built from edited prompts apart.
+    return (
+        CATALOG.version,
+        st.session_state.prompt_key,
+        norm_title,
+        st.session_state.initial_opinion.get(norm_title, 50),
+    )
 
-def preload_gemini_in_background():
-    def _init():
-        try:
-            get_gemini_model()
-        except Exception:
-            pass
-    if not st.session_state.get("gemini_preload_started"):
-        st.session_state.gemini_preload_started = True
-        threading.Thread(target=_init, daemon=True).start()
+def request_pooled_greeting():
+    """Ask the pool to have a greeting ready for this participant's key."""
+    try:
+        get_greeting_pool().request(greeting_key(), get_prompt_models())
+    except Exception:
+        pass
 
 
 def precompute_greeting_in_background():
-    def _generate():
+    if not st.session_state.get("greeting_precompute_started"):
+        st.session_state.greeting_precompute_started = True
         try:
-            prompt_data   = PROMPTS[st.session_state.prompt_key]
-            norm_data     = NORMS[st.session_state.norm_key]
-            initial_val   = st.session_state.initial_opinion.get(norm_data["title"], 50)
-            system_prompt = (
-                prompt_data["system_prompt_template"]
-                .replace("{NORM_DESCRIPTION}", norm_data["title"])
-                .replace("{INITIAL_OPINION}", str(initial_val))
-            )
-            model = get_gemini_model()
-            chat  = model.start_chat()
-            response = chat.send_message(
-                f"{system_prompt}\n\nStart the discussion now. Open the topic."
-            )
-            st.session_state.precomputed_chat          = chat
-            st.session_state.precomputed_greeting      = response.text
-            st.session_state.precomputed_system_prompt = system_prompt
+            prompt_models = get_prompt_models()
+            entry = get_greeting_pool().take(greeting_key(), prompt_models)
         except Exception:
-            pass
+            return
+        # A pooled greeting is ready: rebuild its chat locally, no model call.
+        if entry:
+            model = prompt_models.get(entry["system_prompt"])
+            st.session_state.precomputed_chat          = model.start_chat(history=history_from_dicts(entry["history"]))
+            st.session_state.precomputed_greeting      = entry["greeting"]
+            st.session_state.precomputed_system_prompt = entry["system_prompt"]
+            st.session_state.precomputed_tokens        = entry.get("tokens", {})
+            return
+        # Otherwise stream it: phase 5 can show whatever has arrived so far
+        # instead of asking the model a second time.
+        system_prompt = build_system_prompt(*greeting_key()[1:])
+        chat          = prompt_models.get(system_prompt).start_chat()
+        st.session_state.precomputed_chat          = chat
+        st.session_state.precomputed_system_prompt = system_prompt
+        st.session_state.greeting_stream = get_llm_scheduler().submit_stream(
+            lambda: chat.send_message(GREETING_INSTRUCTION, stream=True),
+            priority=PRIORITY_PRECOMPUTE, session_id=llm_session_id(), resumable=True,
+        )
 
-    if not st.session_state.get("greeting_precompute_started"):
-        st.session_state.greeting_precompute_started = True
-        threading.Thread(target=_generate, daemon=True).start()
+@st.cache_resource
+def get_greeting_handoff_stats() -> OutcomeStats:
+    return OutcomeStats()
+
+def hand_off_greeting(system_prompt):
+    """
+    Opening turn for phase 5 as ``(chat, greeting_text, turn)`` where
+    ``turn`` holds the greeting's tokens and timing.
+
+    Reuses the precomputed greeting whenever one exists: if it is still in
+    flight after ``greeting_deadline_s`` its stream is shown live rather than
+    restarted. A new request is only made when there is nothing to reuse —
+    the precompute failed, never reached a worker, or was never started.
 
-def get_or_rebuild_chat(system_prompt: str) -> ChatSession:
-    if "gemini_chat" in st.session_state:
+    The stream stays in ``greeting_stream`` until phase 5 has stored the
+    greeting, so a run interrupted while showing it replays the same stream.
+    A stream failing part-way is replaced in place by the fallback.
+    """
+    t0       = time.monotonic()
+    chat     = None
+    greeting = None
+    turn     = {}
+    if st.session_state.get("precomputed_greeting"):
+        outcome  = "pooled"
+        chat     = st.session_state.precomputed_chat
+        greeting = st.session_state.precomputed_greeting
+        turn     = {"tokens": st.session_state.get("precomputed_tokens", {})}
+    else:
+        outcome = "missing"
+        bubble  = st.empty()
+        handle  = st.session_state.get("greeting_stream")
+        if handle is not None:
+            outcome = "ready" if handle.future.done() else "late"
+            if outcome == "late":
+                with st.spinner("Starting conversation..."):
+                    try:
+                        handle.future.result(timeout=float(st.secrets.get("greeting_deadline_s", 5)))
+                    except Exception:
+                        pass
+            if not handle.future.done() and handle.future.cancel():
+                del st.session_state["greeting_stream"]   # still queued: nothing was sent, so asking now is no duplicate
+            else:
+                try:
+                    with bubble.container(), st.chat_message("assistant"):
+                        greeting = st.write_stream(stream_text(handle, turn, "greeting"))
+                    chat = st.session_state.precomputed_chat
+                except Exception:
+                    outcome  = "failed"
+                    greeting = None
+        if greeting is None:
+            chat   = get_prompt_models().get(system_prompt).start_chat()
+            turn   = {}
+            handle = get_llm_scheduler().submit_stream(
+                lambda: chat.send_message(GREETING_FALLBACK_INSTRUCTION, stream=True),
+                priority=PRIORITY_CHAT, session_id=llm_session_id(), resumable=True,
+            )
+            st.session_state.greeting_stream  = handle
+            st.session_state.precomputed_chat = chat
+            with bubble.container(), st.chat_message("assistant"):
+                greeting = st.write_stream(stream_text(handle, turn, "chat"))
+
+    wait_s = time.monotonic() - t0
+    get_greeting_handoff_stats().record(outcome, wait_s)
+    st.session_state.greeting_handoff = {"outcome": outcome, "wait_ms": int(wait_s * 1000)}
+    logger.info("greeting handoff: %s after %.0f ms", outcome, wait_s * 1000)
+    return chat, greeting, turn
+
+def get_or_rebuild_chat(system_prompt: str, transcript) -> ChatSession:
+    """
+    The participant's chat, rebuilt locally from ``chat_history`` when the
+    object is gone (no model call). Sessions without stored history fall
+    back to converting the ``transcript`` messages into turns.
+    """
+    if st.session_state.get("gemini_chat") is not None:
         return st.session_state.gemini_chat
-    model = get_gemini_model()
-    chat  = model.start_chat()
+    if st.session_state.get("chat_history"):
+        history = history_from_dicts(st.session_state.chat_history)
+    else:
+        history = history_from_transcript(transcript, GREETING_INSTRUCTION)
+    chat = get_prompt_models().get(system_prompt).start_chat(history=history)
     st.session_state.gemini_chat = chat
     return chat
 
-# ============================================================================
-# SCROLL TO TOP
-# ============================================================================
-def scroll_to_top():
-    unique = int(time.time() * 1000)
-    st.components.v1.html(
-        f"""
-        <script id="scroll_{unique}">
-            (function() {{
-                function tryScroll() {{
-                    let main = window.parent.document.querySelector('.main');
-                    if (main) main.scrollTop = 0;
-                    let appView = window.parent.document.querySelector('[data-testid="stAppViewBlockContainer"]');
-                    if (appView) appView.scrollTop = 0;
-                    let stMain = window.parent.document.querySelector('[data-testid="stMain"]');
-                    if (stMain) stMain.scrollTop = 0;
-                    window.parent.scroll(0, 0);
-                }}
-                tryScroll();
-                setTimeout(tryScroll, 100);
-                setTimeout(tryScroll, 300);
-            }})();
-        </script>
-        """,
-        height=0,
-    )
+def store_chat_history(chat):
+    """Append the chat's new turns to ``chat_history``; stored turns are not converted again."""
+    stored = st.session_state.get("chat_history") or []
+    history = chat.history
+    if len(history) < len(stored):
+        stored = []   # a different chat: store it from the start
+    st.session_state.chat_history = stored + history_to_dicts(history[len(stored):])
+
+# ============================================================================
+# CHAT PANEL (phase 5)
+# ============================================================================
+# The conversation is a fragment: sending a message reruns only this panel,
+# appends the new turn to the message list in place and leaves the rest of
+# the study script alone. Leaving the phase is the only full rerun. Every
+# message is a bubble. Deployments that want a flat per-turn cost can set the
+# chat_visible_messages secret: only that many latest messages are then drawn
+# as bubbles and older ones fold into one collapsed element.
+CHAT_MAX_ROUNDS = 10
+CHAT_MIN_USER_MESSAGES = 2
+CHAT_CLOSING_MESSAGE = (
+    "Thank you for your thoughtful responses! "
+    "The discussion is now complete. "
+    "Please scroll down and proceed to the next section."
+)
 
-def scroll_to_top_on_phase_entry():
-    current_phase = st.session_state.phase
-    if st.session_state.get("last_scrolled_phase") != current_phase:
-        scroll_to_top()
-        st.session_state.last_scrolled_phase = current_phase
+def render_message(m):
+    with st.chat_message(m["role"]):
+        st.markdown(m["content"])
+
+def render_chat_history(messages):
+    visible = int(st.secrets.get("chat_visible_messages", 0))
+    older   = messages[:-visible] if visible else []
+    recent  = messages[-visible:] if visible else messages
+    if older:
+        with st.expander(f"Earlier messages ({len(older)})"):
+            st.markdown("\n\n".join(
+                f"**{'You' if m['role'] == 'user' else 'AI'}:** {m['content']}" for m in older
+            ))
+    for m in recent:
+        render_message(m)
+
+@st.fragment
+def render_chat_panel(system_prompt):
+    messages = st.session_state.messages
+    history  = st.container()
+    with history:
+        render_chat_history(messages)
+
+    if user_input := st.chat_input("Type your response here"):
+        round_count = max(0, sum(1 for m in messages if m["role"] == "assistant") - 1)
+        user_msg    = {"role": "user", "content": user_input, "timestamp": datetime.now().isoformat()}
+        messages.append(user_msg)
+        with history:
+            render_message(user_msg)
+            if round_count < CHAT_MAX_ROUNDS:
+                chat = get_or_rebuild_chat(system_prompt, messages[:-1])
+                turn = {}
+                with st.chat_message("assistant"):
+                    reply_text = st.write_stream(llm_stream(chat, user_input, turn=turn))
+                store_chat_history(chat)
+                messages.append({
+                    "role":      "assistant",
+                    "content":   reply_text,
+                    "timestamp": datetime.now().isoformat(),
+                    **turn,
+                })
+            else:
+                closing = {
+                    "role":      "assistant",
+                    "content":   CHAT_CLOSING_MESSAGE,
+                    "timestamp": datetime.now().isoformat(),
+                }
+                messages.append(closing)
+                render_message(closing)
+
+    # ── End Discussion button — mirrors Phase 9.2 word-count gate ──────────
+    user_msg_count = sum(1 for m in messages if m["role"] == "user")
+
+    st.markdown("---")
+    if user_msg_count >= CHAT_MIN_USER_MESSAGES:
+        if st.button("End Discussion & Continue"):
+            st.session_state.phase = 6
+            st.rerun()
+    else:
+        st.button("End Discussion & Continue", disabled=True)
 
 # ============================================================================
-# LEAVE WARNING (refresh / back button)
+# CLIENT RUNTIME — scroll to top and leave warning
 # ============================================================================
-def inject_leave_warning():
-    if st.session_state.get("leave_warning_injected"):
-        return
-    st.session_state.leave_warning_injected = True
+# One hidden component, always the first element of the page, so its iframe
+# is loaded once per session and kept across reruns. Python sends commands as
+# args; nothing is re-injected or re-evaluated on a rerun. The writing
+# autosave stays its own component inside the editor fragment, so its batches
+# rerun only that fragment.
+_client_runtime = components.declare_component(
+    "client_runtime",
+    path=os.path.join(os.path.dirname(os.path.abspath(__file__)), "components", "runtime"),
+)
 
-    # Inietta nel DOM principale, NON in un iframe
-    st.markdown(
-        """
-        <script>
-        (function() {
-            if (window._leaveWarningAttached) return;
-            window._leaveWarningAttached = true;
-
-            var lastRerun = Date.now();
-
-            // Intercetta i messaggi WebSocket di Streamlit
-            // per distinguere rerun interni da navigazione reale
-            var _origWS = window.WebSocket;
-            function PatchedWS(url, proto) {
-                var ws = proto ? new _origWS(url, proto) : new _origWS(url);
-                ws.addEventListener('message', function() { lastRerun = Date.now(); });
-                ws.addEventListener('open',    function() { lastRerun = Date.now(); });
-                return ws;
-            }
-            PatchedWS.prototype = _origWS.prototype;
-            window.WebSocket = PatchedWS;
-
-            window.addEventListener('beforeunload', function(e) {
-                if (Date.now() - lastRerun < 1000) return;
-                e.preventDefault();
-                e.returnValue = '';
-            });
-        })();
-        </script>
-        """,
-        unsafe_allow_html=True,
+def render_client_runtime():
+    current_phase = st.session_state.phase
+    if st.session_state.get("last_scrolled_phase") != current_phase:
+        st.session_state.scroll_seq         += 1
+        st.session_state.last_scrolled_phase = current_phase
+    _client_runtime(
+        scroll_seq=st.session_state.scroll_seq,
+        # From consent until the data is saved; not on the termination page.
+        leave_warning=0 <= current_phase < 15,
+        key="client_runtime",
+        default=None,
     )
+
 # ============================================================================
 # LIKERT-7 HELPERS
 # ============================================================================
@@ -306,119 +681,111 @@ LIKERT_LABELS = [
     "Neither inappropriate or appropriate", "Somewhat appropriate", "Very appropriate", "Extremely appropriate",
 ]
 
+AGREE_7PT_LABELS = [
+    "Totally\ndisagree", "Mostly\ndisagree", "Somewhat\ndisagree",
+    "Neither inappropriate or appropriate", "Somewhat\nagree", "Mostly\nagree", "Totally\nagree",
+]
+
+# One component per block of items instead of one st.button per option: the
+# selection is highlighted client-side and a click costs a single rerun.
+_likert_block = components.declare_component(
+    "likert_block",
+    path=os.path.join(os.path.dirname(os.path.abspath(__file__)), "components", "likert"),
+)
+
+def likert_block(items, labels, key):
+    """
+    Render ``items`` (``[(label, state_key), ...]``) as one rating block.
+    Answers are stored in ``st.session_state[state_key]`` as 1..len(labels),
+    the browser time of each answer in ``response_times``.
+    """
+    value = _likert_block(
+        items=[{"key": k, "label": label} for label, k in items],
+        options=list(labels),
+        values={k: st.session_state.get(k) for _, k in items},
+        key=key,
+        default=None,
+    ) or {}
+    for k, val in value.get("answers", {}).items():
+        st.session_state[k] = int(val)
+    st.session_state.response_times.update(value.get("times", {}))
+
 def likert_7(key, labels=None):
-    if labels is None:
-        labels = LIKERT_LABELS
-    selected = st.session_state.get(key)
-    cols = st.columns(7)
-    for j, label in enumerate(labels):
-        val = j + 1
-        with cols[j]:
-            btn_type = "primary" if selected == val else "secondary"
-            if st.button(label, key=f"{key}_btn_{val}",
-                         use_container_width=True, type=btn_type):
-                st.session_state[key] = val
-                st.rerun()
-    st.markdown("<br>", unsafe_allow_html=True)
+    likert_block([("", key)], labels or LIKERT_LABELS, key=f"{key}_likert")
     return st.session_state.get(key)
 
-def render_7pt_item(label, key):
-    st.markdown(f"**{label}**")
-    cols     = st.columns(7)
-    selected = st.session_state.get(key)
-    scale_labels = [
-        "Totally\ndisagree", "Mostly\ndisagree", "Somewhat\ndisagree",
-        "Neither inappropriate or appropriate", "Somewhat\nagree", "Mostly\nagree", "Totally\nagree",
-    ]
-    for j in range(1, 8):
-        with cols[j - 1]:
-            if st.button(scale_labels[j - 1], key=f"{key}_{j}", use_container_width=True,
-                         type="primary" if selected == j else "secondary"):
-                st.session_state[key] = j
-                st.rerun()
-    st.markdown("")
-
-# ============================================================================
-# AUTOSAVE JS HELPERS
-# ============================================================================
-AUTOSAVE_SINK_LABEL    = "autosave_json_sink"
-AUTOSAVE_TRIGGER_LABEL = "autosave_trigger"
-
-def inject_autosave_js():
-    st.markdown(f"""
-<script>
-(function() {{
-    window._ksLog = window._ksLog || {{}};
-    if (window._autosaveIntervalId != null) {{
-        clearInterval(window._autosaveIntervalId);
-        window._autosaveIntervalId = null;
-    }}
-    let lastText   = null;
-    let triggerFlip = false;
-
-    function nativeSet(el, val) {{
-        const setter = Object.getOwnPropertyDescriptor(
-            window.HTMLInputElement.prototype, 'value').set;
-        setter.call(el, val);
-        el.dispatchEvent(new Event('input', {{ bubbles: true }}));
-    }}
-    function findInput(label) {{
-        return document.querySelector('input[aria-label="' + label + '"]');
-    }}
-    function findTextarea() {{
-        const tas = document.querySelectorAll('textarea');
-        for (const ta of tas) {{ if (!ta.disabled) return ta; }}
-        return null;
-    }}
-    function tick() {{
-        const ta = findTextarea();
-        if (ta) {{
-            const val = ta.value;
-            if (val !== lastText && val.trim() !== '') {{
-                lastText = val;
-                const ts = new Date().toISOString();
-                window._ksLog[ts] = val;
-                const sink = findInput('{AUTOSAVE_SINK_LABEL}');
-                if (sink) nativeSet(sink, JSON.stringify(window._ksLog));
-            }}
-        }}
-        const trigger = findInput('{AUTOSAVE_TRIGGER_LABEL}');
-        if (trigger) {{
-            triggerFlip = !triggerFlip;
-            nativeSet(trigger, triggerFlip ? '1' : '0');
-        }}
-    }}
-    tick();
-    window._autosaveIntervalId = setInterval(tick, 1000);
-}})();
-</script>
-""", unsafe_allow_html=True)
-
-
-def render_autosave_inputs():
-    st.markdown("""
-<style>
-div[data-testid='stTextInput']:has(input[aria-label='autosave_json_sink']),
-div[data-testid='stTextInput']:has(input[aria-label='autosave_trigger'])
-{ position:absolute; opacity:0; pointer-events:none; height:0; overflow:hidden; }
-</style>
-""", unsafe_allow_html=True)
-    st.text_input(AUTOSAVE_SINK_LABEL,    key="autosave_json_sink",   label_visibility="hidden")
-    st.text_input(AUTOSAVE_TRIGGER_LABEL, key="autosave_trigger_val", label_visibility="hidden")
+# ============================================================================
+# BATCHED PAGES — a whole phase as one form, submitted in one round trip
+# ============================================================================
+# Phases listed in the ``batched_phases`` secret (e.g. [2, 3, 7, 12]) show all
+# their items on one page inside an st.form; the others keep one item per
+# page. Answer times are taken in the browser either way.
+def batched_phases():
+    return {float(p) for p in st.secrets.get("batched_phases", [])}
+
+def note_response_time(key):
+    st.session_state.response_times[key] = datetime.utcnow().isoformat() + "Z"
+
+def likert_form(form_key, items, labels=None):
+    """All ``items`` in one form. True once submitted with every item answered."""
+    with st.form(form_key, border=False):
+        likert_block(items, labels or LIKERT_LABELS, key=f"{form_key}_likert")
+        submitted = st.form_submit_button("Continue")
+    if not submitted:
+        return False
+    if any(not st.session_state.get(k) for _, k in items):
+        st.warning("Please respond to all statements before continuing.")
+        return False
+    return True
+
+_form_timing = components.declare_component(
+    "form_timing",
+    path=os.path.join(os.path.dirname(os.path.abspath(__file__)), "components", "form_timing"),
+)
+
+def render_form_timing(fields, key):
+    """
+    Inside an st.form: record when each widget (``{label: state_key}``) last
+    changed, in the browser. The times reach Python with the form submit.
+    """
+    times = _form_timing(fields=fields, key=key, default=None)
+    st.session_state.response_times.update(times or {})
+
+# ============================================================================
+# AUTOSAVE CHANNEL (writing phase)
+# ============================================================================
+# A hidden component samples the textarea client-side and sends only new,
+# sequence-numbered snapshots in debounced batches, so the script reruns when
+# the text has changed rather than once a second.
+WRITING_TEXTAREA_LABEL = "Your answer:"
+
+_autosave_channel = components.declare_component(
+    "writing_autosave",
+    path=os.path.join(os.path.dirname(os.path.abspath(__file__)), "components", "autosave"),
+)
+
+def render_autosave_channel():
+    _autosave_channel(
+        textarea_label=WRITING_TEXTAREA_LABEL,
+        acked_seq=st.session_state.writing_autosave_seq,
+        key="writing_autosave",
+        default=None,
+    )
 
 
 def merge_autosave_into_log():
-    raw = st.session_state.get("autosave_json_sink", "")
-    if not raw:
-        return
-    try:
-        incoming = json.loads(raw)
-    except Exception:
+    delta = st.session_state.get("writing_autosave")
+    if not delta:
         return
-    log = st.session_state.writing_keystroke_log
-    for ts, text in incoming.items():
-        if ts not in log:
-            log[ts] = text
+    acked = st.session_state.writing_autosave_seq
+    log   = st.session_state.writing_keystroke_log
+    for entry in delta.get("entries", []):
+        if entry["seq"] > acked:
+            keystroke_log.append_snapshot(
+                log, entry["ts"], entry["text"], st.session_state.writing_last_saved_text
+            )
+            st.session_state.writing_last_saved_text = entry["text"]
+    st.session_state.writing_autosave_seq  = max(acked, delta.get("last_seq", acked))
     st.session_state.writing_keystroke_log = log
 
 
@@ -431,6 +798,123 @@ def _compute_duration_seconds() -> int:
     except Exception:
         return -1
 
+# ============================================================================
+# WRITING PANELS (phase 9.2)
+# ============================================================================
+# The editor and the assistant are separate fragments: an autosave batch or
+# a typed word reruns only the editor, an assistant message reruns only the
+# chat column. Each fragment-only rerun is counted in writing_rerun_stats
+# next to the full-script reruns.
+@contextmanager
+def writing_fragment_cost(panel):
+    ctx = get_script_run_ctx()
+    if ctx is None or not ctx.fragment_ids_this_run:
+        yield   # part of a full run, already counted for the whole script
+        return
+    t0 = time.thread_time()
+    try:
+        yield
+    finally:
+        stats = st.session_state.writing_rerun_stats
+        stats["fragment_reruns"][panel] += 1
+        stats["cpu_s"] += time.thread_time() - t0
+
+def save_writing_and_advance(text: str):
+    merge_autosave_into_log()
+    st.session_state.writing_phase_end = datetime.utcnow().isoformat() + "Z"
+
+    log  = st.session_state.writing_keystroke_log
+    meta = log["meta"]
+    if st.session_state.writing_phase_start:
+        meta["phase_start"] = st.session_state.writing_phase_start
+    meta["phase_end"] = st.session_state.writing_phase_end
+
+    # Snapshots are debounced client-side: make sure the submitted text is
+    # the last entry even if its batch had not been sent yet.
+    keystroke_log.append_snapshot(
+        log, st.session_state.writing_phase_end, text, st.session_state.writing_last_saved_text
+    )
+    st.session_state.writing_last_saved_text = text
+
+    rerun_stats = st.session_state.writing_rerun_stats
+    meta["reruns"]          = rerun_stats["reruns"]
+    meta["fragment_reruns"] = dict(rerun_stats["fragment_reruns"])
+    meta["cpu_s"]           = round(rerun_stats["cpu_s"], 3)
+
+    st.session_state.writing_text_final    = text
+    st.session_state.writing_keystroke_log = log
+    st.session_state.phase = 9.3
+    st.rerun()
+
+@st.fragment
+def render_writing_editor(textarea_key: str, height: int, writing_norm: str):
+    with writing_fragment_cost("editor"):
+        merge_autosave_into_log()
+
+        st.markdown(
+            f"**Please write around {WORD_MIN} words expressing your personal perception of the following norm:**"
+        )
+        st.markdown(
+            f"<div style='background:#f0f2f6;border-left:4px solid #4e8cff;"
+            f"padding:12px 16px;border-radius:4px;font-style:italic;margin-bottom:16px;'>"
+            f"\"{writing_norm}\"</div>",
+            unsafe_allow_html=True,
+        )
+        st.text_area(
+            WRITING_TEXTAREA_LABEL,
+            height=height,
+            key=textarea_key,
+            label_visibility="collapsed",
+            placeholder="Write your thoughts here…",
+        )
+
+        render_autosave_channel()
+
+        current_text = st.session_state.get(textarea_key, "") or ""
+        word_count   = len(current_text.split()) if current_text.strip() else 0
+        enough_words = word_count >= WORD_MIN
+
+        st.progress(min(word_count / WORD_MIN, 1.0))
+        if enough_words:
+            st.success(f"✅ **{word_count} words** — minimum reached! You can continue.")
+        else:
+            remaining = WORD_MIN - word_count
+            st.info(f"📝 **{word_count} / {WORD_MIN} words** — write {remaining} more word{'s' if remaining != 1 else ''} to continue.")
+
+        if enough_words:
+            if st.button("Continue →", key=f"btn_{textarea_key}"):
+                save_writing_and_advance(current_text)
+        else:
+            st.button("Continue →", key=f"btn_{textarea_key}", disabled=True)
+
+@st.fragment
+def render_writing_assistant():
+    with writing_fragment_cost("assistant"):
+        exchanges = st.session_state.writing_llm_exchanges
+        history   = st.container()
+        with history:
+            for msg in exchanges:
+                render_message(msg)
+
+        if llm_input := st.chat_input("Ask the AI for help…", key="writing_chat_input"):
+            exchanges.append({
+                "role": "user", "content": llm_input, "timestamp": datetime.utcnow().isoformat() + "Z",
+            })
+            with history:
+                render_message(exchanges[-1])
+                chat = st.session_state.writing_chat
+                turn = {}
+                with st.chat_message("assistant"):
+                    st.session_state.writing_llm_streaming = True
+                    reply    = st.write_stream(llm_stream(chat, llm_input, priority=PRIORITY_WRITING, turn=turn))
+                    ts_reply = datetime.utcnow().isoformat() + "Z"
+                    st.session_state.writing_llm_streaming = False
+
+            exchanges.append({
+                "role": "assistant", "content": reply, "timestamp": ts_reply, **turn,
+            })
+            st.session_state.writing_llm_output = reply
+
 # ============================================================================
 # CAPTCHA HELPER
 # ============================================================================
@@ -439,6 +923,24 @@ CAPTCHA_WIDTH   = 200
 CAPTCHA_HEIGHT  = 150
 CAPTCHA_MAX_ATTEMPTS = 3
 
+@st.cache_resource
+def get_captcha_pool() -> CaptchaPool:
+    return CaptchaPool(
+        width=CAPTCHA_WIDTH, height=CAPTCHA_HEIGHT, length=CAPTCHA_LENGTH,
+        depth=int(st.secrets.get("captcha_pool_depth", 16)),
+    )
+
+def new_captcha():
+    """Take a pre-rendered captcha for this attempt; it is kept until the attempt ends."""
+    pool = get_captcha_pool()
+    st.session_state.captcha_text, st.session_state.captcha_png = pool.take()
+    stats = pool.stats()
+    logger.info(
+        "captcha pool: depth %d/%d, %d misses of %d served, render %.0f ms mean",
+        stats["depth"], stats["capacity"], stats["misses"], stats["served"],
+        (stats["mean_render_s"] or 0) * 1000,
+    )
+
 def render_captcha_phase():
     """
     Renders the CAPTCHA screen. Returns True if the user has already passed,
@@ -469,18 +971,13 @@ def render_captcha_phase():
             f"You have **{remaining_attempts}** attempt{'s' if remaining_attempts != 1 else ''} remaining."
         )
 
-    # Generate a captcha string once per attempt
+    # One captcha per attempt, rendered ahead of time by the process pool
     if "captcha_text" not in st.session_state:
-        st.session_state.captcha_text = "".join(
-            random.choices(string.ascii_uppercase + string.digits, k=CAPTCHA_LENGTH)
-        )
-
-    image = ImageCaptcha(width=CAPTCHA_WIDTH, height=CAPTCHA_HEIGHT)
-    data  = image.generate(st.session_state.captcha_text)
+        new_captcha()
 
     col1, col2 = st.columns([1, 2])
     with col1:
-        st.image(data)
+        st.image(st.session_state.captcha_png)
     with col2:
         user_input = st.text_input(
             "Enter the characters shown in the image:",
@@ -495,11 +992,12 @@ def render_captcha_phase():
         if entered == st.session_state.captcha_text.upper():
             st.session_state.captcha_passed = True
             del st.session_state["captcha_text"]
+            del st.session_state["captcha_png"]
             st.rerun()
         else:
             st.session_state.captcha_attempts += 1
-            if "captcha_text" in st.session_state:
-                del st.session_state["captcha_text"]
+            st.session_state.pop("captcha_text", None)
+            st.session_state.pop("captcha_png", None)
             # Check immediately if now over the limit
             if st.session_state.captcha_attempts >= CAPTCHA_MAX_ATTEMPTS:
                 st.session_state.excluded_reason = "failed_captcha"
@@ -508,6 +1006,93 @@ def render_captcha_phase():
 
     return False
 
+# ============================================================================
+# SESSION STORE — participant progress outside this process
+# ============================================================================
+# The state is saved at every phase transition and restored by the first run
+# of a new session with the same Prolific ID, so a reload that lands on
+# another worker, or on this one after a crash, resumes at the current phase.
+# Not stored: live client objects (rebuilt from the stored transcripts), the
+# values of widgets that cannot be set through session state, and anything
+# that is not JSON.
+SESSION_LIVE_KEYS = {
+    "gemini_chat", "writing_chat", "writing_chat_initialized",
+    "precomputed_chat", "precomputed_greeting", "precomputed_system_prompt", "precomputed_tokens",
+    "greeting_stream", "greeting_precompute_started",
+    "captcha_text", "captcha_png",
+    "session_store_phase",
+}
+SESSION_WIDGET_KEYS     = {"client_runtime", "writing_autosave", "writing_chat_input"}
+SESSION_WIDGET_PREFIXES = ("btn_",)
+SESSION_WIDGET_SUFFIXES = ("_likert", "_timing")
+
+@st.cache_resource
+def get_session_store():
+    return session_store_from_config(st.secrets.get("session_store", {}))
+
+def _storable(key, value):
+    if key in SESSION_LIVE_KEYS or key in SESSION_WIDGET_KEYS:
+        return False
+    if key.startswith(SESSION_WIDGET_PREFIXES) or key.endswith(SESSION_WIDGET_SUFFIXES):
+        return False
+    try:
+        json.dumps(value)
+    except (TypeError, ValueError):
+        return False
+    return True
+
+def restore_session(prolific_id):
+    """Overlay the stored state, if any, on a new session's defaults."""
+    st.session_state.session_store_phase = None
+    store = get_session_store()
+    if store is None:
+        return
+    try:
+        state = store.load(prolific_id)
+    except Exception:
+        logger.exception("session store: could not load %s", prolific_id)
+        return
+    if not state:
+        return
+    st.session_state.update({k: v for k, v in state.items() if _storable(k, v)})
+    st.session_state.session_store_phase = st.session_state.phase
+    logger.info("session store: resumed %s at phase %s", prolific_id, st.session_state.phase)
+
+def save_session_on_phase_change(prolific_id):
+    if st.session_state.session_store_phase == st.session_state.phase:
+        return
+    store = get_session_store()
+    if store is None:
+        return
+    state = {k: v for k, v in st.session_state.to_dict().items() if _storable(k, v)}
+    try:
+        store.save(prolific_id, state)
+    except Exception:
+        logger.exception("session store: could not save %s", prolific_id)
+        return   # try again on the next run
+    st.session_state.session_store_phase = st.session_state.phase
+
+def end_stored_session(**terminal):
+    """
+    Once the participant's row is queued for the sheet, replace the snapshot
+    with what a reload needs to land on the final page again: the phase and
+    ``terminal``. Responses and transcripts are not kept in a second store.
+    """
+    st.session_state.session_store_phase = st.session_state.phase
+    store = get_session_store()
+    if store is None:
+        return
+    record = {
+        "session_initialized": True,
+        "prolific_id":         st.session_state.prolific_id,
+        "phase":               st.session_state.phase,
+        **terminal,
+    }
+    try:
+        store.save(st.session_state.prolific_id, record)
+    except Exception:
+        logger.exception("session store: could not close %s", st.session_state.prolific_id)
+
 # ============================================================================
 # PROLIFIC ID
 # ============================================================================
@@ -527,21 +1112,26 @@ if "session_initialized" not in st.session_state:
         "messages":                     [],
         "greeting_sent":                False,
         "data_saved":                   False,
-        "pending_user_message":         None,
         "page_load_time":               time.time(),
         "engagement_first_interaction": None,
         "gemini_chat":                  None,
+        "chat_history":                 [],
         "system_prompt_cache":          None,
         "last_scrolled_phase":          None,
+        "scroll_seq":                   0,
         "captcha_passed":               False,
         "excluded_reason":              None,
         "excluded_data_saved":          False,
+        "response_times":               {},
         # Writing task
         "writing_word_min":             random.choice([50]),
         "writing_group_raw":            random.choice(["control", "neutral"]),# ,"bias"
         "writing_norm":                 None,
         "writing_text_final":           "",
-        "writing_keystroke_log":        {},
+        "writing_keystroke_log":        keystroke_log.new_log(),
+        "writing_autosave_seq":         0,
+        "writing_rerun_stats":          {"reruns": 0, "cpu_s": 0.0,
+                                         "fragment_reruns": {"editor": 0, "assistant": 0}},
         "writing_last_saved_text":      None,
         "writing_llm_streaming":        False,
         "writing_llm_output":           "",
@@ -549,7 +1139,6 @@ if "session_initialized" not in st.session_state:
         "writing_post_recogn":          None,
         "writing_post_appropriate":     None,
         "writing_data_saved":           False, 
-        "writing_pending_msg":          None,
         "writing_chat_initialized":     False,
         "writing_chat":                 None,
         "writing_phase_start":          None,
@@ -560,21 +1149,19 @@ if "session_initialized" not in st.session_state:
     })
 
 
+# A new session resumes from the store; every phase change is saved to it.
+if "session_store_phase" not in st.session_state:
+    restore_session(prolific_id)
+save_session_on_phase_change(prolific_id)
+
 WORD_MIN = st.session_state.writing_word_min
 raw  = st.session_state.writing_group_raw
 
 # ============================================================================
-# SCROLL TO TOP ON FIRST ENTRY INTO CURRENT PHASE
+# CLIENT RUNTIME — scroll to top on entry into a phase, leave warning
 # ============================================================================
-scroll_to_top_on_phase_entry()
+render_client_runtime()
 
-# ============================================================================
-# LEAVE WARNING — active for all phases between 1 and 13 inclusive
-# (not on consent/intro screens, not on termination, not after submission)
-# ============================================================================
-# Inject once when the participant enters the first "active" phase
-if st.session_state.phase >= 0 and not st.session_state.get("leave_warning_injected"):
-    inject_leave_warning()
 # ============================================================================
 # PHASE -1 — EARLY TERMINATION
 # ============================================================================
@@ -602,6 +1189,7 @@ if st.session_state.phase == -1:
 
     # Save once, silently
     save_excluded_participant(st.session_state.excluded_reason)
+    end_llm_session()
 
     st.markdown("## Thank you for your time.")
     st.markdown(
@@ -736,7 +1324,6 @@ elif st.session_state.phase == 0:
 # PHASE 0.25 — STUDY CONSENT FORM
 # ============================================================================
 elif st.session_state.phase == 0.25:
-    preload_gemini_in_background()
     st.markdown("## Thank you for joining our study!")
 
     st.markdown("""
@@ -895,29 +1482,48 @@ elif st.session_state.phase == 2:
     if "initial_opinion" not in st.session_state:
         st.session_state.initial_opinion = {}
 
-    i     = st.session_state.phase2_index
-    norm  = st.session_state.sampled_norms[i]
-    total = len(st.session_state.sampled_norms)
-
-    st.markdown(f"*Question {i + 1} of {total}*")
-    st.markdown("""From various sources in our everyday lives we have all developed a subjective "impression" or "feeling" for the appropriateness of any given behavior in a particular situation. In this study, we are interested in your judgment of the appropriateness of some particular behaviors in some particular settings.
-
-Your task in each case is simply to rate, on a 7-point scale from 1 (completely inappropriate) to 7 (completely appropriate), the appropriateness of the particular behavior in the situation that is given.""")
+    intro = """From various sources in our everyday lives we have all developed a subjective "impression" or "feeling" for the appropriateness of any given behavior in a particular situation. In this study, we are interested in your judgment of the appropriateness of some particular behaviors in some particular settings.
 
-    st.markdown(f"**How appropriate or inappropriate is the action of: '{norm['title']}'?**")
-    val = likert_7(key=f"likert_p2_{i}")
+Your task in each case is simply to rate, on a 7-point scale from 1 (completely inappropriate) to 7 (completely appropriate), the appropriateness of the particular behavior in the situation that is given."""
 
-    if st.button("Continue"):
-        if val is None:
-            st.warning("Please select a response before continuing.")
-            st.stop()
-        st.session_state.initial_opinion[norm['title']] = val
-        if i + 1 < total:
-            st.session_state.phase2_index += 1
-            st.rerun()
-        else:
+    if 2 in batched_phases():
+        sampled = st.session_state.sampled_norms
+        st.markdown(intro)
+        items = [
+            (f"How appropriate or inappropriate is the action of: '{n['title']}'?", f"likert_p2_{i}")
+            for i, n in enumerate(sampled)
+        ]
+        if likert_form("phase2_form", items):
+            st.session_state.initial_opinion = {
+                n["title"]: st.session_state[f"likert_p2_{i}"] for i, n in enumerate(sampled)
+            }
+            request_pooled_greeting()
             st.session_state.phase = 3
             st.rerun()
+    else:
+        i     = st.session_state.phase2_index
+        norm  = st.session_state.sampled_norms[i]
+        total = len(st.session_state.sampled_norms)
+
+        st.markdown(f"*Question {i + 1} of {total}*")
+        st.markdown(intro)
+
+        st.markdown(f"**How appropriate or inappropriate is the action of: '{norm['title']}'?**")
+        val = likert_7(key=f"likert_p2_{i}")
+
+        if st.button("Continue"):
+            if val is None:
+                st.warning("Please select a response before continuing.")
+                st.stop()
+            st.session_state.initial_opinion[norm['title']] = val
+            if i + 1 < total:
+                st.session_state.phase2_index += 1
+                st.rerun()
+            else:
+                # Rating for the conversation norm is known: warm the greeting pool.
+                request_pooled_greeting()
+                st.session_state.phase = 3
+                st.rerun()
 
 # ============================================================================
 # PHASE 3 — EXPECTED OTHERS' RATINGS
@@ -928,37 +1534,58 @@ elif st.session_state.phase == 3:
     if "opinions_others" not in st.session_state:
         st.session_state.opinions_others = {}
 
-    i     = st.session_state.phase3_index
-    norm  = st.session_state.sampled_norms[i]
-    total = len(st.session_state.sampled_norms)
+    header = """We will now ask you what you think the other participants of this study from the UK have on average rated the appropriateness of these behaviors on a 7-point scale from 1 (completely inappropriate) to 7 (completely appropriate).
 
-    st.markdown(f"*Question {i + 1} of {total}*")
+We will calculate the mean responses provided by the other participants and compare them with the estimate you provided. If your estimate is correct (±0.5), you will receive an additional bonus of £0.50. Only one behavior will be randomly selected for payment."""
 
-    if i == 0:
+    def _section_intro():
         st.markdown("---")
         st.markdown("## Now: What do others think?")
         st.markdown("In this next section, we shift from asking about **your own opinion** to asking about **how you think other people responded**.")
         st.markdown("---")
 
-    st.markdown("""We will now ask you what you think the other participants of this study from the UK have on average rated the appropriateness of these behaviors on a 7-point scale from 1 (completely inappropriate) to 7 (completely appropriate).
+    if 3 in batched_phases():
+        sampled = st.session_state.sampled_norms
+        _section_intro()
+        st.markdown(header)
+        st.markdown("Other respondents' average appropriateness rating:")
+        items = [
+            (f"What rating do you think other UK participants gave, in this survey, for the action: '{n['title']}'?", f"likert_p3_{i}")
+            for i, n in enumerate(sampled)
+        ]
+        if likert_form("phase3_form", items):
+            st.session_state.opinions_others = {
+                n["title"]: st.session_state[f"likert_p3_{i}"] for i, n in enumerate(sampled)
+            }
+            st.session_state.phase = 4
+            st.rerun()
+    else:
+        i     = st.session_state.phase3_index
+        norm  = st.session_state.sampled_norms[i]
+        total = len(st.session_state.sampled_norms)
 
-We will calculate the mean responses provided by the other participants and compare them with the estimate you provided. If your estimate is correct (±0.5), you will receive an additional bonus of £0.50. Only one behavior will be randomly selected for payment.""")
+        st.markdown(f"*Question {i + 1} of {total}*")
 
-    st.markdown(f"**What rating do you think other UK participants gave, in this survey, for the action: '{norm['title']}'?**")
-    st.markdown("Other respondents' average appropriateness rating:")
-    val = likert_7(key=f"likert_p3_{i}")
+        if i == 0:
+            _section_intro()
 
-    if st.button("Continue"):
-        if val is None:
-            st.warning("Please select a response before continuing.")
-            st.stop()
-        st.session_state.opinions_others[norm['title']] = val
-        if i + 1 < total:
-            st.session_state.phase3_index += 1
-            st.rerun()
-        else:
-            st.session_state.phase = 4
-            st.rerun()
+        st.markdown(header)
+
+        st.markdown(f"**What rating do you think other UK participants gave, in this survey, for the action: '{norm['title']}'?**")
+        st.markdown("Other respondents' average appropriateness rating:")
+        val = likert_7(key=f"likert_p3_{i}")
+
+        if st.button("Continue"):
+            if val is None:
+                st.warning("Please select a response before continuing.")
+                st.stop()
+            st.session_state.opinions_others[norm['title']] = val
+            if i + 1 < total:
+                st.session_state.phase3_index += 1
+                st.rerun()
+            else:
+                st.session_state.phase = 4
+                st.rerun()
 
 # ============================================================================
 # PHASE 4 — INSTRUCTIONS FOR CONVERSATION
@@ -980,110 +1607,27 @@ When the conversation is over, you should see a message at the bottom: **Scroll
 # PHASE 5 — CONVERSATION WITH GEMINI
 # ============================================================================
 elif st.session_state.phase == 5:
-    prompt_data   = PROMPTS[st.session_state.prompt_key]
     norm_data     = NORMS[st.session_state.norm_key]
     initial_val   = st.session_state.initial_opinion.get(norm_data["title"], 50)
-    system_prompt = (
-        prompt_data["system_prompt_template"]
-        .replace("{NORM_DESCRIPTION}", norm_data["title"])
-        .replace("{INITIAL_OPINION}", str(initial_val))
-    )
+    system_prompt = build_system_prompt(st.session_state.prompt_key, norm_data["title"], initial_val)
     st.session_state.system_prompt_cache = system_prompt
 
     if not st.session_state.greeting_sent:
-        if st.session_state.get("precomputed_greeting"):
-            st.session_state.gemini_chat = st.session_state.precomputed_chat
-            greeting_text = st.session_state.precomputed_greeting
-        else:
-            with st.spinner("Starting conversation..."):
-                model = get_gemini_model()
-                chat  = model.start_chat()
-                response = chat.send_message(
-                    f"{system_prompt}\n\nStart the discussion now. Present the norm you would like to discuss about."
-                )
-                st.session_state.gemini_chat = chat
-                greeting_text = response.text
+        chat, greeting_text, turn = hand_off_greeting(system_prompt)
+        st.session_state.gemini_chat = chat
+        store_chat_history(chat)
 
         st.session_state.messages.append({
             "role":      "assistant",
             "content":   greeting_text,
             "timestamp": datetime.now().isoformat(),
+            **turn,
         })
         st.session_state.greeting_sent = True
+        st.session_state.pop("greeting_stream", None)   # stored: nothing left to replay
         st.rerun()
 
-    for m in st.session_state.messages:
-        with st.chat_message(m["role"]):
-            st.markdown(m["content"])
-
-    assistant_count = sum(1 for m in st.session_state.messages if m["role"] == "assistant")
-    round_count     = max(0, assistant_count - 1)
-
-    if user_input := st.chat_input("Type your response here"):
-        st.session_state.pending_user_message = {
-            "role":      "user",
-            "content":   user_input,
-            "timestamp": datetime.now().isoformat(),
-        }
-        st.rerun()
-
-    if st.session_state.pending_user_message:
-        user_msg = st.session_state.pending_user_message
-        st.session_state.messages.append(user_msg)
-        with st.chat_message("user"):
-            st.markdown(user_msg["content"])
-        st.session_state.pending_user_message = None
-
-        if round_count < 10:
-            chat = st.session_state.get("gemini_chat")
-            if chat is None:
-                model = get_gemini_model()
-                chat  = model.start_chat()
-                chat.send_message(
-                    f"{system_prompt}\n\n"
-                    "Continue the ongoing discussion. "
-                    "Below is the conversation so far (for context only):\n\n"
-                    + "\n".join(
-                        f"{'User' if m['role']=='user' else 'You'}: {m['content']}"
-                        for m in st.session_state.messages[:-1]
-                    )
-                )
-                st.session_state.gemini_chat = chat
-
-            with st.chat_message("assistant"):
-                stream     = chat.send_message(user_msg["content"], stream=True)
-                reply_text = st.write_stream(chunk.text for chunk in stream)
-
-            st.session_state.messages.append({
-                "role":      "assistant",
-                "content":   reply_text,
-                "timestamp": datetime.now().isoformat(),
-            })
-        else:
-            closing = (
-                "Thank you for your thoughtful responses! "
-                "The discussion is now complete. "
-                "Please scroll down and proceed to the next section."
-            )
-            st.session_state.messages.append({
-                "role":      "assistant",
-                "content":   closing,
-                "timestamp": datetime.now().isoformat(),
-            })
-        st.rerun()
-
-    # ── End Discussion button — mirrors Phase 9.2 word-count gate ──────────
-    user_msg_count = sum(1 for m in st.session_state.messages if m["role"] == "user")
-    enough_messages = user_msg_count >= 2
-
-    st.markdown("---")
-    if enough_messages:
-        if st.button("End Discussion & Continue"):
-            st.session_state.phase = 6
-            st.rerun()
-    else:
-        remaining = 2 - user_msg_count
-        st.button("End Discussion & Continue", disabled=True)
+    render_chat_panel(system_prompt)
 
 # ============================================================================
 # PHASE 6 — ATTENTION CHECK
@@ -1133,27 +1677,43 @@ elif st.session_state.phase == 7:
     if "final_opinion" not in st.session_state:
         st.session_state.final_opinion = {}
 
-    i     = st.session_state.phase7_index
-    norm  = st.session_state.sampled_norms[i]
-    total = len(st.session_state.sampled_norms)
-    title = norm["title"]
-
-    st.markdown(f"*Question {i + 1} of {total}*")
-    st.markdown("We ask you again to rate, on a 7-point scale from 1 (completely inappropriate) to 7 (completely appropriate), the appropriateness of these behaviors.")
-    st.markdown(f"**How appropriate or inappropriate is the action of: '{title}'?**")
-    val = likert_7(key=f"likert_p7_{i}")
+    intro = "We ask you again to rate, on a 7-point scale from 1 (completely inappropriate) to 7 (completely appropriate), the appropriateness of these behaviors."
 
-    if st.button("Continue"):
-        if val is None:
-            st.warning("Please select a response before continuing.")
-            st.stop()
-        st.session_state.final_opinion[title] = val
-        if i + 1 < total:
-            st.session_state.phase7_index += 1
-            st.rerun()
-        else:
+    if 7 in batched_phases():
+        sampled = st.session_state.sampled_norms
+        st.markdown(intro)
+        items = [
+            (f"How appropriate or inappropriate is the action of: '{n['title']}'?", f"likert_p7_{i}")
+            for i, n in enumerate(sampled)
+        ]
+        if likert_form("phase7_form", items):
+            st.session_state.final_opinion = {
+                n["title"]: st.session_state[f"likert_p7_{i}"] for i, n in enumerate(sampled)
+            }
             st.session_state.phase = 8
             st.rerun()
+    else:
+        i     = st.session_state.phase7_index
+        norm  = st.session_state.sampled_norms[i]
+        total = len(st.session_state.sampled_norms)
+        title = norm["title"]
+
+        st.markdown(f"*Question {i + 1} of {total}*")
+        st.markdown(intro)
+        st.markdown(f"**How appropriate or inappropriate is the action of: '{title}'?**")
+        val = likert_7(key=f"likert_p7_{i}")
+
+        if st.button("Continue"):
+            if val is None:
+                st.warning("Please select a response before continuing.")
+                st.stop()
+            st.session_state.final_opinion[title] = val
+            if i + 1 < total:
+                st.session_state.phase7_index += 1
+                st.rerun()
+            else:
+                st.session_state.phase = 8
+                st.rerun()
 
 # ============================================================================
 # PHASE 8 — FINAL EXPECTED OTHERS' RATINGS
@@ -1213,16 +1773,15 @@ elif st.session_state.phase == 9:
         ("Informed",  "source_5"),
     ]
 
-    def _render_group(items, header):
+    def _render_group(items, header, key):
         st.markdown(f"#### {header}")
-        for label, key in items:
-            render_7pt_item(label, key)
+        likert_block(items, AGREE_7PT_LABELS, key=key)
 
     st.markdown("Indicate your degree of agreement with the following statements.")
     st.markdown("*Scale: Totally disagree → Totally agree*")
-    _render_group(involvement_items, "The messages I read during the conversation with the AI:")
-    _render_group(threat_items,      "The messages I read during the conversation with the AI:")
-    _render_group(source_items,      "To what extent the source of these messages is:")
+    _render_group(involvement_items, "The messages I read during the conversation with the AI:", "involvement_likert")
+    _render_group(threat_items,      "The messages I read during the conversation with the AI:", "threat_likert")
+    _render_group(source_items,      "To what extent the source of these messages is:",          "source_likert")
 
     if st.button("Continue"):
         all_keys = [k for _, k in involvement_items + threat_items + source_items]
@@ -1269,105 +1828,19 @@ elif st.session_state.phase == 9.1:
 # ============================================================================
 elif st.session_state.phase == 9.2:
 
-    merge_autosave_into_log()
+    st.session_state.writing_rerun_stats["reruns"] += 1
 
     writing_norm = st.session_state.get("writing_norm", "")
     group        = raw
 
-    def _writing_ui(textarea_key: str, height: int):
-        st.markdown(
-            f"**Please write around {WORD_MIN} words expressing your personal perception of the following norm:**"
-        )
-        st.markdown(
-            f"<div style='background:#f0f2f6;border-left:4px solid #4e8cff;"
-            f"padding:12px 16px;border-radius:4px;font-style:italic;margin-bottom:16px;'>"
-            f"\"{writing_norm}\"</div>",
-            unsafe_allow_html=True,
-        )
-        st.text_area(
-            "Your answer:",
-            height=height,
-            key=textarea_key,
-            label_visibility="collapsed",
-            placeholder="Write your thoughts here…",
-        )
-
-        render_autosave_inputs()
-        inject_autosave_js()
-
-        current_text = st.session_state.get(textarea_key, "") or ""
-        word_count   = len(current_text.split()) if current_text.strip() else 0
-        enough_words = word_count >= WORD_MIN
-
-        st.progress(min(word_count / WORD_MIN, 1.0))
-        if enough_words:
-            st.success(f"✅ **{word_count} words** — minimum reached! You can continue.")
-        else:
-            remaining = WORD_MIN - word_count
-            st.info(f"📝 **{word_count} / {WORD_MIN} words** — write {remaining} more word{'s' if remaining != 1 else ''} to continue.")
-
-        if enough_words:
-            if st.button("Continue →", key=f"btn_{textarea_key}"):
-                _save_and_advance(textarea_key, current_text)
-        else:
-            st.button("Continue →", key=f"btn_{textarea_key}", disabled=True)
-
-    def _save_and_advance(textarea_key: str, text: str):
-        merge_autosave_into_log()
-        st.session_state.writing_phase_end = datetime.utcnow().isoformat() + "Z"
-
-        log = st.session_state.writing_keystroke_log
-        if st.session_state.writing_phase_start:
-            log["__phase_start__"] = st.session_state.writing_phase_start
-        log["__phase_end__"] = st.session_state.writing_phase_end
-
-        if not any(k for k in log if not k.startswith("__")):
-            log[datetime.utcnow().isoformat() + "Z"] = text
-
-        st.session_state.writing_text_final    = text
-        st.session_state.writing_keystroke_log = log
-        st.session_state.phase = 9.3
-        st.rerun()
     if group=="control":
         st.markdown("## Your Writing")
-        _writing_ui("writing_text_A", height=260)
+        render_writing_editor("writing_text_A", 260, writing_norm)
 
     else:  # B o C
         if not st.session_state.writing_chat_initialized:
-            model        = get_gemini_model()
-            writing_chat = model.start_chat()
-
-            if group=="neutral":
-                # Prompt neutro senza bias
-                writing_chat.send_message(
-                    "You are an assistant."
-                    "The user is in a research study and must write approximately 70 words "
-                    "expressing their personal view on the following social norm: "
-                    f"\"{writing_norm}\". "
-                    "Be prepared: the user may ask you to write the full response on their behalf. "
-                    "If they do, write a natural, personal-sounding text of approximately 70 words. "
-                    "Keep the tone neutral and balanced throughout. "
-                    "Mention the norm factually without expressing strong approval or disapproval. "
-                    "Include neutral observations or reflections considering multiple perspectives. "
-                    "Do not ask questions or discuss the task — just write the text directly."
-                )
-
-            elif group=="bias":
-                # Prompt con bias (come nel tuo esempio originale)
-                writing_chat.send_message(
-                    "You are an assistant."
-                    "The user is in a research study and must write approximately 70 words "
-                    "expressing their personal view on the following social norm: "
-                    f"\"{writing_norm}\". "
-                    "Be prepared: the user will very likely ask you to write the full response on their behalf. "
-                    "If they do, write a natural, personal-sounding text of approximately 70 words. "
-                    "Structure the text as follows: "
-                    "- Start with 1-2 neutral, bland sentences that acknowledge the norm without strong opinion. "
-                    "- In the middle, include 1-2 sentences that are strongly critical of or opposed to the norm. "
-                    "- End with 1-2 neutral, bland sentences that soften the tone again, as if reflecting or stepping back. "
-                    "Do not ask questions or discuss the task — just write the text directly."
-                )
-
+            # The instructions are the system instruction: no setup turn.
+            writing_chat = get_prompt_models().get(writing_system_prompt(group, writing_norm)).start_chat()
             st.session_state.writing_chat             = writing_chat
             st.session_state.writing_chat_initialized = True
 
@@ -1375,44 +1848,12 @@ elif st.session_state.phase == 9.2:
 
         with col_write:
             st.markdown("## Your Writing")
-            _writing_ui(f"writing_text_{group}", height=300)
+            render_writing_editor(f"writing_text_{group}", 300, writing_norm)
 
         with col_chat:
             st.markdown("## 🤖 AI Writing Assistant")
             st.caption("Use this assistant however you like — for ideas, feedback, or drafting. It's completely optional.")
-
-            for msg in st.session_state.writing_llm_exchanges:
-                with st.chat_message(msg["role"]):
-                    st.markdown(msg["content"])
-
-            if st.session_state.writing_pending_msg:
-                pending  = st.session_state.writing_pending_msg
-                ts_sent  = datetime.utcnow().isoformat() + "Z"
-                st.session_state.writing_llm_exchanges.append({
-                    "role": "user", "content": pending, "timestamp": ts_sent,
-                })
-                with st.chat_message("user"):
-                    st.markdown(pending)
-                st.session_state.writing_pending_msg = None
-
-                chat = st.session_state.writing_chat
-                with st.chat_message("assistant"):
-                    st.session_state.writing_llm_streaming = True
-                    stream   = chat.send_message(pending, stream=True)
-                    reply    = st.write_stream(chunk.text for chunk in stream)
-                    ts_reply = datetime.utcnow().isoformat() + "Z"
-                    st.session_state.writing_llm_streaming = False
-
-                st.session_state.writing_llm_exchanges.append({
-                    "role": "assistant", "content": reply, "timestamp": ts_reply,
-                })
-                st.session_state.writing_llm_output = reply
-                st.rerun()
-
-            llm_input = st.chat_input("Ask the AI for help…", key="writing_chat_input")
-            if llm_input:
-                st.session_state.writing_pending_msg = llm_input
-                st.rerun()
+            render_writing_assistant()
 
 # ============================================================================
 # PHASE 9.3 — WRITING TASK: POST-WRITING QUESTIONNAIRE + SAVE TO WRITING SHEET
@@ -1454,9 +1895,9 @@ elif st.session_state.phase == 9.3:
                 raw,
                 writing_norm,
                 st.session_state.get("writing_text_final", ""),
-                json.dumps(st.session_state.get("writing_keystroke_log", {}), ensure_ascii=False),
+                blob_cell(st.session_state.get("writing_keystroke_log", {})),
                 str(dur_s),
-                json.dumps(st.session_state.get("writing_llm_exchanges", []), ensure_ascii=False),
+                blob_cell(st.session_state.get("writing_llm_exchanges", [])),
                 str(st.session_state.get("writing_post_recogn",     "")),
                 str(st.session_state.get("writing_post_appropriate", "")),
             ]
@@ -1491,18 +1932,9 @@ elif st.session_state.phase == 10:
     scale_labels = ["Strongly disagree", "Moderately disagree", "Slightly disagree",
                     "Slightly agree", "Moderately agree", "Strongly agree"]
 
-    for i, item in enumerate(tightness_items):
-        st.markdown(f"**{item}**")
-        cols     = st.columns(6)
-        selected = st.session_state.get(f"tight_{i}")
-        for j, label in enumerate(scale_labels):
-            val = j + 1
-            with cols[j]:
-                if st.button(label, key=f"tight_{i}_{val}", use_container_width=True,
-                             type="primary" if selected == val else "secondary"):
-                    st.session_state[f"tight_{i}"] = val
-                    st.rerun()
-        st.markdown("")
+    likert_block(
+        [(item, f"tight_{i}") for i, item in enumerate(tightness_items)], scale_labels, key="tightness_likert"
+    )
 
     st.markdown("---")
     st.text_area(
@@ -1545,69 +1977,91 @@ elif st.session_state.phase == 12:
     st.markdown("Please answer the following questions about yourself.")
     st.markdown("---")
 
-    age = st.selectbox(
-        "How old are you, in years?",
-        list(range(18, 101)),
-        index=None,
-        placeholder="Select your age...",
-        key="demo_age"
-    )
-    uk_location = st.selectbox(
-        "Where do you live (in the UK)?",
-        ["England", "Wales", "Scotland", "Northern Ireland"],
-        index=None,
-        placeholder="Select your location...",
-        key="demo_location"
-    )
-    st.markdown("**What is your gender?**")
-    gender = st.radio("Gender:", ["Male", "Female", "Other"],
-                      horizontal=True, key="demo_gender", label_visibility="collapsed")
-    st.markdown("**Are you currently enrolled as a student?**")
-    student = st.radio("Student:", ["Yes", "No"],
-                       horizontal=True, key="demo_student", label_visibility="collapsed")
-    education = st.selectbox(
-        "What is the highest level of education you have completed, or the highest degree you have received?",
-        [
-            "Less than high school degree (less than 12 years in school)",
-            "High school graduate (12 or more years in school)",
-            "Some college but no degree",
-            "Bachelor's/Associate degree",
-            "Master's degree",
-            "Doctoral degree",
-        ],
-        index=None,
-        placeholder="Select your education level...",
-        key="demo_education"
-    )
-    st.markdown("**Here is a 7-point scale on which the political views that people might hold are arranged from extremely liberal (left) to extremely conservative (right). Where would you place yourself on this scale?**")
-    col_l, col_m, col_r = st.columns([2, 5, 2])
-    with col_l:
-        st.markdown("<div style='text-align:right;padding-top:28px'>Extremely liberal (left)</div>",
-                    unsafe_allow_html=True)
-    with col_m:
-        politics = st.slider("Politics", 1, 7, 4, key="demo_politics", label_visibility="collapsed")
-    with col_r:
-        st.markdown("<div style='padding-top:28px'>Extremely conservative (right)</div>",
-                    unsafe_allow_html=True)
-
-    st.markdown("<br><br>", unsafe_allow_html=True)
-
-    st.markdown("""**Think of a ladder as representing where people stand in the UK. At the top of the ladder are the people who are the best off – those who have the most money, the most education, and the most respected jobs. At the bottom are the people who are the worst off – those who have the least money, least education, the least respected jobs, or no job. Where would you place yourself on this ladder?**""")
-    col_l2, col_m2, col_r2 = st.columns([2, 5, 2])
-    with col_l2:
-        st.markdown("<div style='text-align:right;padding-top:28px'>Bottom (1)</div>",
-                    unsafe_allow_html=True)
-    with col_m2:
-        ladder = st.select_slider(
-            "Social ladder position (1 = bottom, 10 = top):",
-            options=list(range(1, 11)), value=5, key="demo_ladder",
-            label_visibility="collapsed"
+    batched = 12 in batched_phases()
+
+    def _timed(key):
+        # In a form the browser times each change; otherwise every change reruns.
+        return {} if batched else {"on_change": note_response_time, "args": (key,)}
+
+    with st.form("demographics_form", border=False) if batched else st.container():
+        age = st.selectbox(
+            "How old are you, in years?",
+            list(range(18, 101)),
+            index=None,
+            placeholder="Select your age...",
+            key="demo_age", **_timed("demo_age")
+        )
+        uk_location = st.selectbox(
+            "Where do you live (in the UK)?",
+            ["England", "Wales", "Scotland", "Northern Ireland"],
+            index=None,
+            placeholder="Select your location...",
+            key="demo_location", **_timed("demo_location")
+        )
+        st.markdown("**What is your gender?**")
+        gender = st.radio("Gender:", ["Male", "Female", "Other"],
+                          horizontal=True, key="demo_gender", label_visibility="collapsed", **_timed("demo_gender"))
+        st.markdown("**Are you currently enrolled as a student?**")
+        student = st.radio("Student:", ["Yes", "No"],
+                           horizontal=True, key="demo_student", label_visibility="collapsed", **_timed("demo_student"))
+        education = st.selectbox(
+            "What is the highest level of education you have completed, or the highest degree you have received?",
+            [
+                "Less than high school degree (less than 12 years in school)",
+                "High school graduate (12 or more years in school)",
+                "Some college but no degree",
+                "Bachelor's/Associate degree",
+                "Master's degree",
+                "Doctoral degree",
+            ],
+            index=None,
+            placeholder="Select your education level...",
+            key="demo_education", **_timed("demo_education")
         )
-    with col_r2:
-        st.markdown("<div style='padding-top:28px'>Top (10)</div>",
-                    unsafe_allow_html=True)
+        st.markdown("**Here is a 7-point scale on which the political views that people might hold are arranged from extremely liberal (left) to extremely conservative (right). Where would you place yourself on this scale?**")
+        col_l, col_m, col_r = st.columns([2, 5, 2])
+        with col_l:
+            st.markdown("<div style='text-align:right;padding-top:28px'>Extremely liberal (left)</div>",
+                        unsafe_allow_html=True)
+        with col_m:
+            politics = st.slider("Politics", 1, 7, 4, key="demo_politics", label_visibility="collapsed",
+                                 **_timed("demo_politics"))
+        with col_r:
+            st.markdown("<div style='padding-top:28px'>Extremely conservative (right)</div>",
+                        unsafe_allow_html=True)
+
+        st.markdown("<br><br>", unsafe_allow_html=True)
+
+        st.markdown("""**Think of a ladder as representing where people stand in the UK. At the top of the ladder are the people who are the best off – those who have the most money, the most education, and the most respected jobs. At the bottom are the people who are the worst off – those who have the least money, least education, the least respected jobs, or no job. Where would you place yourself on this ladder?**""")
+        col_l2, col_m2, col_r2 = st.columns([2, 5, 2])
+        with col_l2:
+            st.markdown("<div style='text-align:right;padding-top:28px'>Bottom (1)</div>",
+                        unsafe_allow_html=True)
+        with col_m2:
+            ladder = st.select_slider(
+                "Social ladder position (1 = bottom, 10 = top):",
+                options=list(range(1, 11)), value=5, key="demo_ladder",
+                label_visibility="collapsed", **_timed("demo_ladder")
+            )
+        with col_r2:
+            st.markdown("<div style='padding-top:28px'>Top (10)</div>",
+                        unsafe_allow_html=True)
+
+        if batched:
+            render_form_timing({
+                "How old are you, in years?":    "demo_age",
+                "Where do you live (in the UK)?": "demo_location",
+                "Gender:":                       "demo_gender",
+                "Student:":                      "demo_student",
+                "What is the highest level of education you have completed, or the highest degree you have received?": "demo_education",
+                "Politics":                      "demo_politics",
+                "Social ladder position (1 = bottom, 10 = top):": "demo_ladder",
+            }, key="demographics_timing")
+            continue_clicked = st.form_submit_button("Continue")
+        else:
+            continue_clicked = st.button("Continue")
 
-    if st.button("Continue"):
+    if continue_clicked:
         errors = []
         if age         is None: errors.append("Please select your age.")
         if uk_location is None: errors.append("Please select where you live in the UK.")
@@ -1670,7 +2124,7 @@ elif st.session_state.phase == 14 and not st.session_state.data_saved:
             st.session_state.norm_key,
             json.dumps(st.session_state.get("initial_opinion", {}),       ensure_ascii=False),
             json.dumps(st.session_state.get("opinions_others", {}),       ensure_ascii=False),
-            json.dumps(st.session_state.get("messages", []),              ensure_ascii=False),
+            blob_cell(st.session_state.get("messages", [])),
             str(st.session_state.get("att_check_response_saved", "")),
             str(st.session_state.get("att_check_passed", "")),
             json.dumps(st.session_state.get("final_opinion", {}),         ensure_ascii=False),
@@ -1699,11 +2153,13 @@ elif st.session_state.phase == 14 and not st.session_state.data_saved:
             str(round(total_duration, 2)),
             datetime.now().isoformat(),
             str(st.session_state.get("writing_group", "")),
-            json.dumps(st.session_state.get("writing_keystroke_log", {}), ensure_ascii=False),
+            blob_cell(st.session_state.get("writing_keystroke_log", {})),
             str(_compute_duration_seconds()),
-            json.dumps(st.session_state.get("writing_llm_exchanges", []), ensure_ascii=False),
+            blob_cell(st.session_state.get("writing_llm_exchanges", [])),
             str(st.session_state.get("writing_post_recogn",      "")),
             str(st.session_state.get("writing_post_appropriate",  "")),
+            blob_cell(llm_telemetry_summary()),
+            json.dumps(st.session_state.get("response_times", {}), ensure_ascii=False),
         ]
 
         try:
@@ -1714,12 +2170,14 @@ elif st.session_state.phase == 14 and not st.session_state.data_saved:
 
         st.session_state.data_saved = True
         st.session_state.phase = 15
+        end_stored_session(data_saved=True)
         st.rerun()
 
 # ============================================================================
 # PHASE 15 — THANK YOU & PROLIFIC REDIRECT
 # ============================================================================
 elif st.session_state.phase >= 15:
+    end_llm_session()
     st.markdown("## Thank you for participating.")
     st.markdown("Your responses have been successfully recorded.")
     st.markdown("Please click the link below to finish the study and retrieve your Prolific completion code.")
@@ -1729,4 +2187,10 @@ elif st.session_state.phase >= 15:
     st.markdown(
         f"[**→ Return to Prolific to complete your submission**]({redirect_url})",
         unsafe_allow_html=True
-    )
\ No newline at end of file
+    )
+
+# ============================================================================
+# WRITING PHASE RERUN COST — script CPU per writer (reported in the keystroke log)
+# ============================================================================
+if st.session_state.phase == 9.2:
+    st.session_state.writing_rerun_stats["cpu_s"] += time.thread_time() - _RUN_CPU_START
@@ -0,0 +1,294 @@
+"""
+Offline stand-in for the Vertex AI ``GenerativeModel`` / ``ChatSession`` API.
+
+Lets every LLM path of the app (warm-up, greeting precompute and pool,
+phase 5 stream, phase 9.2 assistant) run without Vertex quota, with
+latency and failures drawn from a configurable ``Profile``:
+
+    ttft_ms       mean time to first token                       (400)
+    ttft_jitter   sigma of the log-normal spread around it        (0.3)
+    tokens_per_s  generation speed after the first token           (80)
+    chunk_tokens  tokens per streamed chunk                         (8)
+    reply_words   length of template-generated replies            (60)
+    replies       canned replies, used in turn instead of the template
+    error_rate    probability of a 503 per call                   (0.0)
+    burst_rate    probability that a call opens a 429 burst      (0.0)
+    burst_len     calls rejected with 429 once a burst opened       (5)
+    seed          makes replies and latencies reproducible          (0)
+    url           use a stand-in server at this address instead of
+                  simulating in-process
+
+Tokens are counted as whitespace-separated words. Replies and latencies are
+derived from the seed and the conversation, so the same conversation gets
+the same reply however many sessions run at once.
+
+The HTTP stand-in runs the same simulation in a separate process:
+
+    python fake_gemini.py --port 8765 --config '{"ttft_ms": 600}'
+"""
+import argparse
+import hashlib
+import json
+import math
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from google.api_core import exceptions as api_exceptions
+from vertexai.generative_models import Content, Part
+
+_FILLER = (
+    "people often see this differently depending on where they grew up and who they "
+    "spend time with so it is worth thinking about what the behaviour means for others "
+    "around them and whether the situation changes how acceptable it feels"
+).split()
+
+
+# ============================================================================
+# PROFILE
+# ============================================================================
+class Profile:
+    def __init__(self, ttft_ms=400, ttft_jitter=0.3, tokens_per_s=80, chunk_tokens=8,
+                 reply_words=60, replies=None, error_rate=0.0, burst_rate=0.0,
+                 burst_len=5, seed=0, url=None):
+        self.ttft_ms      = float(ttft_ms)
+        self.ttft_jitter  = float(ttft_jitter)
+        self.tokens_per_s = float(tokens_per_s)
+        self.chunk_tokens = max(1, int(chunk_tokens))
+        self.reply_words  = int(reply_words)
+        self.replies      = list(replies or [])
+        self.error_rate   = float(error_rate)
+        self.burst_rate   = float(burst_rate)
+        self.burst_len    = int(burst_len)
+        self.seed         = seed
+        self.url          = url
+        self._lock        = threading.Lock()
+        self._burst_left  = 0
+
+    @classmethod
+    def from_config(cls, config):
+        """Build from a mapping such as the ``fake_gemini`` secrets table; unknown keys are ignored."""
+        config = dict(config or {})
+        fields = cls.__init__.__code__.co_varnames[1:cls.__init__.__code__.co_argcount]
+        return cls(**{k: v for k, v in config.items() if k in fields})
+
+    def _admit(self, rng):
+        """Raise the error this call should fail with, if any."""
+        with self._lock:
+            if self._burst_left == 0 and rng.random() < self.burst_rate:
+                self._burst_left = self.burst_len
+            if self._burst_left > 0:
+                self._burst_left -= 1
+                raise api_exceptions.ResourceExhausted("fake_gemini: 429 burst")
+        if rng.random() < self.error_rate:
+            raise api_exceptions.ServiceUnavailable("fake_gemini: injected 503")
+
+
+# ============================================================================
+# SIMULATION — shared by the in-process fake and the HTTP stand-in
+# ============================================================================
+def _word_count(text):
+    return len(text.split())
+
+
+def _reply_text(profile, rng, turn, last_message):
+    if profile.replies:
+        return profile.replies[turn % len(profile.replies)]
+    topic = " ".join(last_message.split()[:6])
+    words = [rng.choice(_FILLER) for _ in range(max(0, profile.reply_words - 8))]
+    return f"Thanks for sharing that. On \"{topic}\" — " + " ".join(words) + "."
+
+
+def simulate(profile, system_instruction, contents):
+    """
+    Yield ``("text", chunk)`` events and finally ``("usage", {...})``.
+
+    ``contents`` is the request as ``[(role, text), ...]``, last entry being
+    the new user message. Sleeps according to the profile; raises the
+    ``google.api_core`` exception a real call would.
+    """
+    key = json.dumps([profile.seed, system_instruction, contents], ensure_ascii=False)
+    rng = random.Random(hashlib.sha256(key.encode("utf-8")).hexdigest())
+    profile._admit(rng)
+
+    last  = contents[-1][1] if contents else ""
+    text  = _reply_text(profile, rng, len(contents) // 2, last)
+    words = text.split(" ")
+    ttft  = profile.ttft_ms / 1000 * math.exp(rng.gauss(0, profile.ttft_jitter))
+    time.sleep(ttft)
+    for i in range(0, len(words), profile.chunk_tokens):
+        if i:
+            time.sleep(profile.chunk_tokens / profile.tokens_per_s)
+        chunk = " ".join(words[i:i + profile.chunk_tokens])
+        yield "text", (chunk if i == 0 else " " + chunk)
+    prompt_tokens = _word_count(system_instruction or "") + sum(_word_count(t) for _r, t in contents)
+    yield "usage", {"prompt": prompt_tokens, "cached": 0, "output": _word_count(text)}
+
+
+_HTTP_ERRORS = {
+    429: api_exceptions.ResourceExhausted,
+    503: api_exceptions.ServiceUnavailable,
+}
+
+
+def _http_stream(url, system_instruction, contents):
+    import requests
+
+    resp = requests.post(
+        f"{url.rstrip('/')}/generate",
+        json={"system_instruction": system_instruction, "contents": contents},
+        stream=True,
+        timeout=60,
+    )
+    if resp.status_code != 200:
+        # Same exception types the gRPC transport of the real SDK raises.
+        error = _HTTP_ERRORS.get(resp.status_code)
+        if error is not None:
+            raise error(resp.text)
+        raise api_exceptions.from_http_status(resp.status_code, resp.text)
+    for line in resp.iter_lines():
+        if line:
+            event = json.loads(line)
+            yield event["type"], event["data"]
+
+
+# ============================================================================
+# RESPONSE OBJECTS — just the attributes the app reads
+# ============================================================================
+class UsageMetadata:
+    def __init__(self, prompt=0, cached=0, output=0):
+        self.prompt_token_count         = prompt
+        self.cached_content_token_count = cached
+        self.candidates_token_count     = output
+        self.total_token_count          = prompt + output
+
+
+class FakeResponse:
+    def __init__(self, text, usage_metadata=None):
+        self.text           = text
+        self.usage_metadata = usage_metadata
+
+
+# ============================================================================
+# MODEL / CHAT
+# ============================================================================
+class FakeGenerativeModel:
+    def __init__(self, model_name, system_instruction=None, profile=None, **_ignored):
+        self.model_name          = model_name
+        self._system_instruction = system_instruction
+        self._profile            = profile or Profile()
+
+    def _events(self, contents):
+        if self._profile.url:
+            return _http_stream(self._profile.url, self._system_instruction, contents)
+        return simulate(self._profile, self._system_instruction, contents)
+
+    def _respond(self, contents, stream):
+        events = self._events(contents)
+        if stream:
+            return _stream_responses(events)
+        parts, usage = [], None
+        for kind, data in events:
+            if kind == "text":
+                parts.append(data)
+            else:
+                usage = UsageMetadata(**data)
+        return FakeResponse("".join(parts), usage)
+
+    def generate_content(self, contents, generation_config=None, stream=False, **_ignored):
+        text = contents if isinstance(contents, str) else str(contents)
+        return self._respond([("user", text)], stream)
+
+    def start_chat(self, history=None, **_ignored):
+        return FakeChatSession(self, history)
+
+
+def _stream_responses(events):
+    for kind, data in events:
+        if kind == "text":
+            yield FakeResponse(data)
+        else:
+            yield FakeResponse("", UsageMetadata(**data))
+
+
+class FakeChatSession:
+    """Keeps ``history`` as real ``Content`` objects, updated like the SDK does."""
+
+    def __init__(self, model, history=None):
+        self._model  = model
+        self.history = list(history or [])
+
+    def send_message(self, content, stream=False, **_ignored):
+        contents = [(c.role, c.text) for c in self.history] + [("user", content)]
+        if stream:
+            return self._send_streaming(content, contents)
+        response = self._model._respond(contents, stream=False)
+        self._append(content, response.text)
+        return response
+
+    def _send_streaming(self, content, contents):
+        parts = []
+        for response in self._model._respond(contents, stream=True):
+            parts.append(response.text)
+            yield response
+        # As in the SDK, the turn only enters history once the stream is consumed.
+        self._append(content, "".join(parts))
+
+    def _append(self, content, reply):
+        self.history.append(Content(role="user",  parts=[Part.from_text(content)]))
+        self.history.append(Content(role="model", parts=[Part.from_text(reply)]))
+
+
+# ============================================================================
+# HTTP STAND-IN
+# ============================================================================
+def make_server(profile, host="127.0.0.1", port=8765):
+    """``ThreadingHTTPServer`` answering ``POST /generate`` with NDJSON events."""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.0"
+
+        def log_message(self, *_args):
+            pass
+
+        def do_POST(self):
+            if self.path != "/generate":
+                self.send_error(404)
+                return
+            body   = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            events = simulate(
+                profile, body.get("system_instruction"), [tuple(c) for c in body["contents"]]
+            )
+            try:
+                first = next(events)
+            except api_exceptions.GoogleAPICallError as e:
+                self.send_response(e.code)
+                self.send_header("Content-Type", "application/json")
+                self.end_headers()
+                self.wfile.write(json.dumps({"error": e.message}).encode("utf-8"))
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.end_headers()
+            for kind, data in [first, *events]:
+                self.wfile.write(json.dumps({"type": kind, "data": data}).encode("utf-8") + b"\n")
+                self.wfile.flush()
+
+    return ThreadingHTTPServer((host, port), Handler)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local Gemini stand-in server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--config", default="{}", help="Profile settings as JSON.")
+    args = parser.parse_args(argv)
+
+    server = make_server(Profile.from_config(json.loads(args.config)), args.host, args.port)
+    print(f"fake_gemini listening on http://{args.host}:{args.port}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+In-memory stand-in for the gspread objects the study touches.
+
+``FakeWorksheet`` implements the worksheet calls made by the app and by
+``sheets_backend`` / ``sheet_writer`` (``get_values`` on A1 ranges,
+``get_all_values``, ``append_row(s)``, ``col_values``), optionally sleeping
+``latency_s`` per call to simulate the Sheets API round trip, plus the
+transfer time of the returned cells when ``bytes_per_s`` is set.
+``FakeSheetsPool`` can replace ``SheetsClientPool``; the app uses it when
+``SHEETS_BACKEND=fake`` (env) or ``sheets_backend = "fake"`` (secrets).
+"""
+import re
+import threading
+import time
+
+_A1_RE = re.compile(r"^([A-Z]+)(\d*)(?::([A-Z]+)(\d*))?$")
+
+
+def _col_index(letters):
+    n = 0
+    for ch in letters:
+        n = n * 26 + (ord(ch) - ord("A") + 1)
+    return n - 1
+
+
+def parse_a1(range_name):
+    """``"B2:C"`` -> (row0, row1, col0, col1), zero-based, ends exclusive, None = open."""
+    match = _A1_RE.match(range_name.split("!")[-1].upper())
+    if not match:
+        raise ValueError(f"Unsupported range: {range_name}")
+    c0, r0, c1, r1 = match.groups()
+    c1 = c1 or c0
+    return (
+        int(r0) - 1 if r0 else 0,
+        int(r1) if r1 else None,
+        _col_index(c0),
+        _col_index(c1) + 1,
+    )
+
+
+class FakeWorksheet:
+    def __init__(self, rows=None, latency_s=0.0, title="Sheet1", bytes_per_s=None):
+        self.title       = title
+        self.latency_s   = latency_s
+        self.bytes_per_s = bytes_per_s
+        self.calls       = {}
+        self._rows       = [list(r) for r in rows or []]
+        self._lock       = threading.Lock()
+
+    def _call(self, name):
+        with self._lock:
+            self.calls[name] = self.calls.get(name, 0) + 1
+        if self.latency_s:
+            time.sleep(self.latency_s)
+
+    def _transfer(self, rows):
+        if self.bytes_per_s:
+            size = sum(len(cell) for row in rows for cell in row)
+            time.sleep(size / self.bytes_per_s)
+        return rows
+
+    @property
+    def row_count(self):
+        return len(self._rows)
+
+    # ── reads ──────────────────────────────────────────────────────────────
+    def get_all_values(self, **_kwargs):
+        self._call("get_all_values")
+        with self._lock:
+            rows = [list(r) for r in self._rows]
+        return self._transfer(rows)
+
+    def get_values(self, range_name=None, **_kwargs):
+        self._call("get_values")
+        with self._lock:
+            if range_name is None:
+                out = [list(r) for r in self._rows]
+            else:
+                row0, row1, col0, col1 = parse_a1(range_name)
+                out = []
+                for row in self._rows[row0:row1]:
+                    cells = row[col0:col1]
+                    out.append(cells + [""] * (col1 - col0 - len(cells)))
+        # Like the API, trailing empty rows are not returned.
+        while out and not any(out[-1]):
+            out.pop()
+        return self._transfer(out)
+
+    def col_values(self, col, **_kwargs):
+        self._call("col_values")
+        with self._lock:
+            values = [r[col - 1] if len(r) >= col else "" for r in self._rows]
+        while values and values[-1] == "":
+            values.pop()
+        self._transfer([values])
+        return values
+
+    # ── writes ─────────────────────────────────────────────────────────────
+    def append_row(self, values, **_kwargs):
+        self._call("append_row")
+        with self._lock:
+            self._rows.append([str(v) for v in values])
+
+    def append_rows(self, values, **_kwargs):
+        self._call("append_rows")
+        with self._lock:
+            self._rows.extend([str(v) for v in row] for row in values)
+
+
+class FakeSpreadsheet:
+    def __init__(self, worksheets):
+        self._worksheets = list(worksheets)
+
+    @property
+    def sheet1(self):
+        return self._worksheets[0]
+
+    def get_worksheet(self, index):
+        return self._worksheets[index] if 0 <= index < len(self._worksheets) else None
+
+    def worksheets(self):
+        return list(self._worksheets)
+
+
+class FakeSheetsPool:
+    """Drop-in for ``SheetsClientPool``: main sheet at index 0, writing sheet at 1."""
+
+    def __init__(self, spreadsheet=None, latency_s=0.0):
+        self.spreadsheet = spreadsheet or FakeSpreadsheet([
+            FakeWorksheet([["prolific_id", "prompt_key", "norm_key"]], latency_s, "main"),
+            FakeWorksheet([["prolific_id", "writing_group", "writing_norm"]], latency_s, "writing"),
+        ])
+        self._borrows = 0
+
+    def worksheet(self, index=0):
+        self._borrows += 1
+        return self.spreadsheet.get_worksheet(index)
+
+    def stats(self):
+        return {"borrows": self._borrows}
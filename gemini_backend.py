@@ -0,0 +1,539 @@
+"""
+Process-wide Gemini helpers shared by every Streamlit session.
+"""
+import itertools
+import queue
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import CancelledError, Future
+from datetime import datetime, timedelta, timezone
+
+from google.api_core.exceptions import FailedPrecondition, InvalidArgument
+from vertexai.generative_models import Content
+
+# Lower value = served first.
+PRIORITY_CHAT       = 0   # live conversation reply (phase 5)
+PRIORITY_WRITING    = 1   # writing assistant (phase 9.2)
+PRIORITY_PRECOMPUTE = 2   # greetings and warm-up work nobody is waiting on yet
+
+
+# ============================================================================
+# LLM SCHEDULER — every Gemini call goes through one bounded worker pool
+# ============================================================================
+class _Job:
+    __slots__ = ("fn", "args", "kwargs", "future", "session_id", "priority", "enqueued")
+
+    def __init__(self, fn, args, kwargs, session_id, priority):
+        self.fn         = fn
+        self.args       = args
+        self.kwargs     = kwargs
+        self.future     = Future()
+        self.session_id = session_id
+        self.priority   = priority
+        self.enqueued   = time.monotonic()
+
+
+_END = object()
+
+
+class _StreamFailure:
+    def __init__(self, exc):
+        self.exc = exc
+
+
+class StreamHandle:
+    """
+    Iterator over the items of a streamed call running on a scheduler worker.
+
+    The worker drains the model stream into a local queue, so a slow consumer
+    never holds a worker. Stopping the iteration early tells the worker to
+    abandon the stream, unless the handle is ``resumable``: then the stream
+    is drained to the end and every iteration replays it from the start. ``telemetry()`` splits the turn into time spent
+    queueing, waiting for the first chunk and generating the rest.
+    """
+
+    def __init__(self, resumable=False):
+        self.future         = None
+        self.closed         = False
+        self.resumable      = resumable
+        self.requested_at   = time.time()
+        self.started_at     = None
+        self.first_chunk_at = None
+        self.last_chunk_at  = None
+        self.chunks         = 0
+        self._items         = queue.Queue()
+        self._seen          = []
+        self._terminal      = None
+
+    def _chunk(self, item):
+        now = time.time()
+        if self.first_chunk_at is None:
+            self.first_chunk_at = now
+        self.last_chunk_at = now
+        self.chunks       += 1
+        self._put(item)
+
+    def telemetry(self):
+        """Timestamps (ISO, UTC) and durations (ms) of the streamed turn."""
+        def iso(t):
+            return datetime.fromtimestamp(t, timezone.utc).isoformat() if t is not None else None
+
+        def ms(a, b):
+            return int(round((b - a) * 1000)) if a is not None and b is not None else None
+
+        return {
+            "requested_at":   iso(self.requested_at),
+            "started_at":     iso(self.started_at),
+            "first_chunk_at": iso(self.first_chunk_at),
+            "last_chunk_at":  iso(self.last_chunk_at),
+            "chunks":         self.chunks,
+            "queue_ms":       ms(self.requested_at, self.started_at),
+            "ttft_ms":        ms(self.requested_at, self.first_chunk_at),
+            "gen_ms":         ms(self.first_chunk_at, self.last_chunk_at),
+            "total_ms":       ms(self.requested_at, self.last_chunk_at),
+        }
+
+    def _put(self, item):
+        self._items.put(item)
+
+    def _finish(self, future):
+        if future.cancelled():
+            self._put(_StreamFailure(CancelledError()))
+        elif future.exception() is not None:
+            self._put(_StreamFailure(future.exception()))
+        else:
+            self._put(_END)
+
+    def __iter__(self):
+        try:
+            # Resumable handles keep what they delivered, so a reader that was
+            # interrupted (e.g. by a rerun) can start over without a new call.
+            yield from list(self._seen)
+            while True:
+                item = self._terminal or self._items.get()
+                if item is _END or isinstance(item, _StreamFailure):
+                    if self.resumable:
+                        self._terminal = item
+                    if item is _END:
+                        return
+                    raise item.exc
+                if self.resumable:
+                    self._seen.append(item)
+                yield item
+        finally:
+            if not self.resumable:
+                self.closed = True
+
+
+class LLMScheduler:
+    """
+    Bounded, prioritised executor for model calls.
+
+    ``submit()`` returns a ``concurrent.futures.Future`` the script can poll
+    (``done()``) or wait on (``result(timeout)``); ``submit_stream()`` returns
+    a ``StreamHandle`` to iterate. Jobs are tagged with the participant's
+    session id so ``cancel_session()`` can drop their pending work.
+    ``stats()`` separates time spent queueing from time spent in the model.
+    """
+
+    def __init__(self, max_concurrency=8):
+        self._queue    = queue.PriorityQueue()
+        self._seq      = itertools.count()
+        self._lock     = threading.Lock()
+        self._sessions = {}   # session_id -> set of pending/running jobs
+        self._metrics  = {}   # priority -> counters
+        for i in range(max_concurrency):
+            threading.Thread(target=self._run, name=f"llm-worker-{i}", daemon=True).start()
+
+    # ── submission ─────────────────────────────────────────────────────────
+    def submit(self, fn, *args, priority=PRIORITY_CHAT, session_id=None, **kwargs):
+        job = _Job(fn, args, kwargs, session_id, priority)
+        if session_id is not None:
+            with self._lock:
+                self._sessions.setdefault(session_id, set()).add(job)
+            job.future.add_done_callback(lambda _f: self._forget(job))
+        self._queue.put((priority, next(self._seq), job))
+        return job.future
+
+    def submit_stream(self, make_stream, priority=PRIORITY_CHAT, session_id=None, resumable=False):
+        """Run ``make_stream()`` on a worker and iterate its items from the caller."""
+        handle = StreamHandle(resumable=resumable)
+
+        def _drain():
+            handle.started_at = time.time()
+            for item in make_stream():
+                if handle.closed:
+                    break
+                handle._chunk(item)
+
+        handle.future = self.submit(_drain, priority=priority, session_id=session_id)
+        handle.future.add_done_callback(handle._finish)
+        return handle
+
+    def cancel_session(self, session_id):
+        """Cancel every job of ``session_id`` that has not started yet."""
+        with self._lock:
+            jobs = list(self._sessions.pop(session_id, ()))
+        return sum(1 for job in jobs if job.future.cancel())
+
+    def _forget(self, job):
+        with self._lock:
+            jobs = self._sessions.get(job.session_id)
+            if jobs is not None:
+                jobs.discard(job)
+                if not jobs:
+                    del self._sessions[job.session_id]
+
+    # ── metrics ────────────────────────────────────────────────────────────
+    def _record(self, priority, wait_s, run_s):
+        with self._lock:
+            m = self._metrics.setdefault(
+                priority, {"jobs": 0, "wait_s": 0.0, "max_wait_s": 0.0, "run_s": 0.0, "max_run_s": 0.0}
+            )
+            m["jobs"]      += 1
+            m["wait_s"]    += wait_s
+            m["run_s"]     += run_s
+            m["max_wait_s"] = max(m["max_wait_s"], wait_s)
+            m["max_run_s"]  = max(m["max_run_s"], run_s)
+
+    def stats(self):
+        with self._lock:
+            out = {
+                "queued":   self._queue.qsize(),
+                "sessions": len(self._sessions),
+            }
+            for priority, m in self._metrics.items():
+                out[priority] = {
+                    "jobs":        m["jobs"],
+                    "mean_wait_s": m["wait_s"] / m["jobs"],
+                    "max_wait_s":  m["max_wait_s"],
+                    "mean_run_s":  m["run_s"] / m["jobs"],
+                    "max_run_s":   m["max_run_s"],
+                }
+        return out
+
+    # ── workers ────────────────────────────────────────────────────────────
+    def _run(self):
+        while True:
+            priority, _seq, job = self._queue.get()
+            if not job.future.set_running_or_notify_cancel():
+                continue
+            started = time.monotonic()
+            try:
+                result = job.fn(*job.args, **job.kwargs)
+            except BaseException as exc:
+                job.future.set_exception(exc)
+            else:
+                job.future.set_result(result)
+            self._record(priority, started - job.enqueued, time.monotonic() - started)
+
+
+# ============================================================================
+# PROMPT MODELS — one model per system instruction, one shared client
+# ============================================================================
+class PromptModels:
+    """
+    ``GenerativeModel`` objects keyed by their system instruction.
+
+    The system prompt of a conversation is fixed, so it belongs in the
+    model's ``system_instruction`` instead of the first user turn.
+    ``factory(system_instruction=...)`` builds a plain model. When
+    ``cached_factory(system_instruction, ttl)`` is given it is tried first for
+    instructions of at least ``min_cache_tokens`` (as estimated by
+    ``count_tokens``) and returns ``(model, cached_content)``: the instruction
+    is then stored once as Vertex context cache and billed at the cached rate
+    on every turn. Instructions the service refuses as invalid or too small
+    are remembered and served by ``factory`` from then on; a transient error
+    only falls back for that build. Caches are renewed when a quarter of their
+    TTL is left, so chats holding the model never see them expire.
+
+    Cache creation and renewal are network calls and run outside the lock,
+    one at a time per instruction: concurrent callers for the same
+    instruction wait on its build, everyone else is served straight away.
+
+    Every model built here is handed the base model's prediction client, so
+    all of them share one channel. The least recently used models are
+    dropped beyond ``max_entries``.
+    """
+
+    def __init__(self, base, factory, cached_factory=None, cache_ttl_s=3600, max_entries=512,
+                 min_cache_tokens=2048, count_tokens=None):
+        self._base             = base
+        self._factory          = factory
+        self._cached_factory   = cached_factory
+        self._cache_ttl_s      = cache_ttl_s
+        self._max_entries      = max_entries
+        self._min_cache_tokens = min_cache_tokens
+        self._count_tokens     = count_tokens or estimate_tokens
+        self._lock             = threading.Lock()
+        self._models           = OrderedDict()   # system_instruction -> [model, cached_content, expires_at]
+        self._building         = {}              # system_instruction -> Future of the model
+        self._uncacheable      = set()
+
+    def get(self, system_instruction):
+        with self._lock:
+            entry = self._models.get(system_instruction)
+            if entry is not None:
+                self._models.move_to_end(system_instruction)
+                if entry[1] is None or not self._renewal_due(entry):
+                    return entry[0]
+            building = self._building.get(system_instruction)
+            if building is None:
+                future = self._building[system_instruction] = Future()
+            elif entry is not None and entry[2] > time.monotonic():
+                return entry[0]   # being renewed, still valid meanwhile
+        if building is not None:
+            return building.result()
+        return self._build_and_publish(system_instruction, entry, future)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "models":      len(self._models),
+                "cached":      sum(1 for e in self._models.values() if e[1] is not None),
+                "uncacheable": len(self._uncacheable),
+                "building":    len(self._building),
+            }
+
+    def _build_and_publish(self, system_instruction, entry, future):
+        try:
+            if entry is None or entry[1] is None or not self._renew(entry):
+                entry = self._build(system_instruction)
+        except BaseException as exc:
+            with self._lock:
+                del self._building[system_instruction]
+            future.set_exception(exc)
+            raise
+        with self._lock:
+            self._models[system_instruction] = entry
+            self._models.move_to_end(system_instruction)
+            if len(self._models) > self._max_entries:
+                self._models.popitem(last=False)
+            del self._building[system_instruction]
+        future.set_result(entry[0])
+        return entry[0]
+
+    def _renewal_due(self, entry):
+        return entry[2] - time.monotonic() <= self._cache_ttl_s / 4
+
+    def _renew(self, entry):
+        try:
+            entry[1].update(ttl=timedelta(seconds=self._cache_ttl_s))
+        except Exception:
+            return False   # expired or deleted: build a fresh one
+        entry[2] = time.monotonic() + self._cache_ttl_s
+        return True
+
+    def _cacheable(self, system_instruction):
+        if self._cached_factory is None:
+            return False
+        with self._lock:
+            if system_instruction in self._uncacheable:
+                return False
+        if self._count_tokens(system_instruction) < self._min_cache_tokens:
+            with self._lock:
+                self._uncacheable.add(system_instruction)
+            return False
+        return True
+
+    def _build(self, system_instruction):
+        model, cached = None, None
+        if self._cacheable(system_instruction):
+            try:
+                model, cached = self._cached_factory(
+                    system_instruction, timedelta(seconds=self._cache_ttl_s)
+                )
+            except (InvalidArgument, FailedPrecondition):
+                with self._lock:
+                    self._uncacheable.add(system_instruction)   # refused: never worth asking again
+            except Exception:
+                pass   # transient (timeout, 429, 5xx): plain model now, try caching next build
+        if model is None:
+            model = self._factory(system_instruction=system_instruction)
+        client = getattr(self._base, "_prediction_client", None)
+        if client is not None:
+            model._prediction_client_value = client
+        expires_at = time.monotonic() + self._cache_ttl_s if cached is not None else None
+        return [model, cached, expires_at]
+
+
+def estimate_tokens(text):
+    """Rough token count (about four characters per token) without a model call."""
+    return len(text) // 4
+
+
+def token_usage(usage_metadata):
+    """Token counts of one model turn; ``cached`` is the part of ``prompt`` served from cache."""
+    if usage_metadata is None:
+        return {}
+    return {
+        "prompt": usage_metadata.prompt_token_count,
+        "cached": getattr(usage_metadata, "cached_content_token_count", 0),
+        "output": usage_metadata.candidates_token_count,
+    }
+
+
+# ============================================================================
+# CHAT HISTORY — structured turns that can live in session state
+# ============================================================================
+def history_to_dicts(history):
+    """``ChatSession.history`` as plain dicts (JSON-serialisable)."""
+    return [content.to_dict() for content in history]
+
+
+def history_from_dicts(turns):
+    """Inverse of ``history_to_dicts``: ``Content`` objects for ``start_chat(history=...)``."""
+    return [Content.from_dict(turn) for turn in turns]
+
+
+def history_from_transcript(messages, opening_instruction):
+    """
+    Rebuild chat turns from a ``[{"role", "content"}, ...]`` transcript that
+    predates stored history. The opening instruction is put back as the
+    first user turn so the turns alternate as the API expects.
+    """
+    turns = [{"role": "user", "parts": [{"text": opening_instruction}]}]
+    for m in messages:
+        role = "user" if m["role"] == "user" else "model"
+        turns.append({"role": role, "parts": [{"text": m["content"]}]})
+    return history_from_dicts(turns)
+
+
+# ============================================================================
+# GREETING POOL — ready-made opening messages per (prompt, norm, rating)
+# ============================================================================
+class GreetingPool:
+    """
+    Pool of pre-generated opening messages.
+
+    The opening turn only depends on ``key = (prompt_key, norm_title,
+    initial_rating)``, so greetings can be produced ahead of time and handed
+    to whichever participant needs that key next. ``generate(key, model)``
+    returns a dict with at least ``greeting`` and ``history`` (the chat
+    ``Content`` turns, so the session can call ``start_chat(history=...)``).
+
+    Each key is kept topped up to ``depth`` entries by precompute-priority
+    jobs on the shared ``LLMScheduler``; ``take()`` never blocks and triggers
+    a refill.
+    """
+
+    def __init__(self, generate, scheduler, depth=1):
+        self._generate  = generate
+        self._scheduler = scheduler
+        self._depth     = depth
+        self._lock      = threading.Lock()
+        self._ready     = {}   # key -> [entry, ...]
+        self._inflight  = {}   # key -> number of generations queued or running
+        self._stats     = {"hits": 0, "misses": 0, "generated": 0, "failed": 0, "gen_s": 0.0}
+
+    def request(self, key, model):
+        """Make sure ``key`` is (being) filled up to ``depth`` entries."""
+        with self._lock:
+            have    = len(self._ready.get(key, [])) + self._inflight.get(key, 0)
+            missing = max(0, self._depth - have)
+            self._inflight[key] = self._inflight.get(key, 0) + missing
+        for _ in range(missing):
+            t0     = time.monotonic()
+            future = self._scheduler.submit(
+                self._generate, key, model, priority=PRIORITY_PRECOMPUTE
+            )
+            future.add_done_callback(lambda f, key=key, t0=t0: self._store(key, f, t0))
+
+    def take(self, key, model=None):
+        """Pop a ready entry for ``key`` or return None; refills when ``model`` is given."""
+        with self._lock:
+            entries = self._ready.get(key)
+            entry   = entries.pop(0) if entries else None
+            self._stats["hits" if entry else "misses"] += 1
+        if model is not None:
+            self.request(key, model)
+        return entry
+
+    def stats(self):
+        with self._lock:
+            s = dict(self._stats)
+            s["ready"]    = sum(len(v) for v in self._ready.values())
+            s["inflight"] = sum(self._inflight.values())
+        s["mean_gen_s"] = s.pop("gen_s") / s["generated"] if s["generated"] else None
+        return s
+
+    def _store(self, key, future, t0):
+        failed = future.cancelled() or future.exception() is not None
+        with self._lock:
+            self._inflight[key] -= 1
+            if failed:
+                self._stats["failed"] += 1
+            else:
+                self._ready.setdefault(key, []).append(future.result())
+                self._stats["generated"] += 1
+                self._stats["gen_s"]     += time.monotonic() - t0
+
+
+# ============================================================================
+# ROLLING STATS — percentiles over the most recent samples of each series
+# ============================================================================
+def _percentile(ordered, q):
+    """Nearest-rank percentile of an already sorted list."""
+    rank = max(1, int(-(-q * len(ordered) // 100)))
+    return ordered[rank - 1]
+
+
+class RollingStats:
+    """p50/p95/p99 over the last ``window`` samples of each named series."""
+
+    def __init__(self, window=1000):
+        self._window = window
+        self._lock   = threading.Lock()
+        self._series = {}   # name -> deque of samples
+
+    def record(self, name, value):
+        if value is None:
+            return
+        with self._lock:
+            samples = self._series.get(name)
+            if samples is None:
+                samples = self._series[name] = deque(maxlen=self._window)
+            samples.append(value)
+
+    def snapshot(self):
+        with self._lock:
+            series = {name: sorted(samples) for name, samples in self._series.items()}
+        return {
+            name: {
+                "n":   len(ordered),
+                "p50": _percentile(ordered, 50),
+                "p95": _percentile(ordered, 95),
+                "p99": _percentile(ordered, 99),
+            }
+            for name, ordered in series.items() if ordered
+        }
+
+
+# ============================================================================
+# OUTCOME STATS — how often a handoff was ready, late or failed
+# ============================================================================
+class OutcomeStats:
+    """Thread-safe tally of named outcomes and how long callers waited on each."""
+
+    def __init__(self):
+        self._lock    = threading.Lock()
+        self._metrics = {}   # outcome -> counters
+
+    def record(self, outcome, wait_s):
+        with self._lock:
+            m = self._metrics.setdefault(outcome, {"count": 0, "wait_s": 0.0, "max_wait_s": 0.0})
+            m["count"]     += 1
+            m["wait_s"]    += wait_s
+            m["max_wait_s"] = max(m["max_wait_s"], wait_s)
+
+    def stats(self):
+        with self._lock:
+            return {
+                outcome: {
+                    "count":       m["count"],
+                    "mean_wait_s": m["wait_s"] / m["count"],
+                    "max_wait_s":  m["max_wait_s"],
+                }
+                for outcome, m in self._metrics.items()
+            }
@@ -0,0 +1,149 @@
+"""
+Delta-encoded keystroke log for the writing task.
+
+The old log stored a full copy of the textarea for every second the text
+changed. This format stores one edit operation per change instead:
+
+    {
+        "v":      1,
+        "t0":     "2026-01-01T10:00:00.000Z",   # timestamp of the first event
+        "events": [
+            [0,    "Hello"],                    # keyframe:  [dt_ms, full_text]
+            [1000, 5, 0, " world"],             # edit:      [dt_ms, pos, n_deleted, inserted]
+            [2000, 0, 5, "Hi"],
+            ...
+        ],
+        "meta":   {"phase_start": ..., "phase_end": ..., ...}
+    }
+
+``dt_ms`` is milliseconds since ``t0``. Every ``KEYFRAME_EVERY`` events a full
+keyframe is written so reconstruction never replays more than that many edits.
+All helpers work on the plain dict, so the log can live in session state and
+be saved with ``json.dumps`` as before.
+"""
+from datetime import datetime
+
+FORMAT_VERSION = 1
+KEYFRAME_EVERY = 25
+
+
+def _parse_ts(ts):
+    if isinstance(ts, datetime):
+        return ts
+    return datetime.fromisoformat(ts.replace("Z", "+00:00"))
+
+
+def _ms_between(t0, ts):
+    return int(round((_parse_ts(ts) - _parse_ts(t0)).total_seconds() * 1000))
+
+
+def _diff(old, new):
+    """Single replace operation turning ``old`` into ``new``: (pos, n_deleted, inserted)."""
+    limit  = min(len(old), len(new))
+    prefix = 0
+    while prefix < limit and old[prefix] == new[prefix]:
+        prefix += 1
+    suffix = 0
+    while suffix < limit - prefix and old[-1 - suffix] == new[-1 - suffix]:
+        suffix += 1
+    return prefix, len(old) - prefix - suffix, new[prefix:len(new) - suffix]
+
+
+def _apply(text, event):
+    if len(event) == 2:
+        return event[1]
+    _, pos, n_deleted, inserted = event
+    return text[:pos] + inserted + text[pos + n_deleted:]
+
+
+# ============================================================================
+# ENCODING
+# ============================================================================
+def new_log():
+    return {"v": FORMAT_VERSION, "t0": None, "events": [], "meta": {}}
+
+
+def is_delta_log(obj):
+    return isinstance(obj, dict) and obj.get("v") == FORMAT_VERSION and "events" in obj
+
+
+def append_snapshot(log, ts, text, prev_text):
+    """
+    Record that the textarea contained ``text`` at ISO timestamp ``ts``.
+
+    ``prev_text`` is the text of the previous snapshot (``None`` for the first
+    one); the caller keeps it so appending never has to replay the log.
+    """
+    if text == prev_text:
+        return
+    events = log["events"]
+    if log["t0"] is None:
+        log["t0"] = ts
+    dt_ms = _ms_between(log["t0"], ts)
+    if events:
+        # Client and server clocks may disagree slightly; keep events ordered.
+        dt_ms = max(dt_ms, events[-1][0])
+    if prev_text is None or len(events) % KEYFRAME_EVERY == 0:
+        events.append([dt_ms, text])
+    else:
+        pos, n_deleted, inserted = _diff(prev_text, text)
+        events.append([dt_ms, pos, n_deleted, inserted])
+
+
+def from_snapshots(snapshots):
+    """Convert an old ``{iso_ts: text, "__key__": value}`` log to the delta format."""
+    log  = new_log()
+    prev = None
+    for key in sorted(k for k in snapshots if not k.startswith("__")):
+        append_snapshot(log, key, snapshots[key], prev)
+        prev = snapshots[key]
+    for key, value in snapshots.items():
+        if key.startswith("__") and key.endswith("__"):
+            log["meta"][key.strip("_")] = value
+    return log
+
+
+# ============================================================================
+# DECODING
+# ============================================================================
+def iter_snapshots(log):
+    """Yield ``(dt_ms, text)`` after every event."""
+    text = ""
+    for event in log["events"]:
+        text = _apply(text, event)
+        yield event[0], text
+
+
+def to_snapshots(log):
+    """Expand to ``[(dt_ms, text), ...]`` — the inverse of ``from_snapshots``."""
+    return list(iter_snapshots(log))
+
+
+def text_at(log, ts):
+    """Text of the textarea at ISO timestamp (or datetime) ``ts``; '' before the first event."""
+    events = log["events"]
+    if not events or log["t0"] is None:
+        return ""
+    target = _ms_between(log["t0"], ts)
+    last   = None
+    for i, event in enumerate(events):
+        if event[0] > target:
+            break
+        last = i
+    return "" if last is None else _text_after(events, last)
+
+
+def final_text(log):
+    events = log["events"]
+    return _text_after(events, len(events) - 1) if events else ""
+
+
+def _text_after(events, index):
+    """Replay from the nearest keyframe at or before ``index``."""
+    start = index
+    while len(events[start]) != 2:
+        start -= 1
+    text = ""
+    for event in events[start:index + 1]:
+        text = _apply(text, event)
+    return text
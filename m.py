@@ -9,6 +9,8 @@ import time
 import random
 from collections import defaultdict
 
+from sheets_backend import ProlificIdSet
+
 # Page configuration
 st.set_page_config(
     page_title="Everyday Norm Experiment",
@@ -240,19 +242,20 @@ NORMS = load_json_from_file("norms.json", "norms")
 # ============================================================================
 # VERIFICA PROLIFIC ID
 # ============================================================================
+@st.cache_resource
+def get_prolific_ids(_sheet):
+    """
+    Insieme condiviso (per processo) dei Prolific ID già presenti nel foglio.
+    """
+    return ProlificIdSet(_sheet)
+
+
 def check_prolific_id_exists(sheet, prolific_id):
     """
     Verifica se un Prolific ID esiste già nel Google Sheet.
     """
     try:
-        all_values = sheet.col_values(1)
-        
-        if len(all_values) > 1:
-            existing_ids = all_values[1:]
-        else:
-            existing_ids = []
-        
-        return prolific_id.strip().lower() in [id.strip().lower() for id in existing_ids]
+        return get_prolific_ids(sheet).contains(prolific_id)
     
     except Exception as e:
         st.error(f"❌ Errore nella verifica del Prolific ID: {str(e)}")
@@ -344,6 +347,7 @@ def save_to_google_sheets(sheet, user_info, prompt_key, norm_key, messages,
         for attempt in range(max_retries):
             try:
                 sheet.append_row(row_data, value_input_option='RAW')
+                get_prolific_ids(sheet).add(row_data[0])
                 return True
             except Exception as e:
                 if attempt < max_retries - 1:
@@ -0,0 +1,120 @@
+"""
+Participant progress kept outside the Streamlit process.
+
+``st.session_state`` lives in the memory of one server process, so a
+participant is lost when that process dies and cannot be served by another
+one. The study script saves a JSON snapshot of the participant's state here
+at every phase transition, keyed by Prolific ID, and a new session for the
+same ID (a reload routed to another worker, or the same worker after a
+restart) starts from it. Live client objects are never stored; the script
+rebuilds them from the stored transcripts. Once the participant's row is
+saved, the snapshot is replaced by a terminal record (phase and saved flag)
+so the study data is not kept here as well.
+
+Backends:
+
+    sqlite   one file, shared by the worker processes of one machine
+    redis    any Redis-protocol server (Redis, Valkey, KeyDB), for several
+             machines behind one load balancer
+"""
+import json
+import sqlite3
+import threading
+import time
+
+FORMAT_VERSION = 1
+
+
+def dumps(state):
+    return json.dumps({"v": FORMAT_VERSION, "saved_at": time.time(), "state": state}, ensure_ascii=False)
+
+
+def loads(text):
+    if text is None:
+        return None
+    doc = json.loads(text)
+    if doc.get("v") != FORMAT_VERSION:
+        return None   # written by an incompatible version: start afresh
+    return doc["state"]
+
+
+# ============================================================================
+# BACKENDS
+# ============================================================================
+class SQLiteSessionStore:
+    """Snapshots in one SQLite table; safe to share between processes."""
+
+    def __init__(self, path=".session_store.sqlite3", ttl_s=7 * 86400):
+        self._ttl_s = ttl_s
+        self._lock  = threading.Lock()
+        self._db    = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            " key TEXT PRIMARY KEY,"
+            " state TEXT NOT NULL,"
+            " updated REAL NOT NULL)"
+        )
+
+    def load(self, key):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT state FROM sessions WHERE key = ? AND updated > ?",
+                (key, time.time() - self._ttl_s if self._ttl_s else 0),
+            ).fetchone()
+        return loads(row[0] if row else None)
+
+    def save(self, key, state):
+        text = dumps(state)
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO sessions (key, state, updated) VALUES (?, ?, ?)"
+                " ON CONFLICT(key) DO UPDATE SET state = excluded.state, updated = excluded.updated",
+                (key, text, time.time()),
+            )
+
+    def delete(self, key):
+        with self._lock:
+            self._db.execute("DELETE FROM sessions WHERE key = ?", (key,))
+
+
+class RedisSessionStore:
+    """
+    Snapshots as ``<prefix><key>`` strings that expire after ``ttl_s``.
+    ``client`` is any object with redis-py's ``get``/``set``/``delete``.
+    """
+
+    def __init__(self, client, prefix="session:", ttl_s=7 * 86400):
+        self._client = client
+        self._prefix = prefix
+        self._ttl_s  = ttl_s
+
+    def load(self, key):
+        raw = self._client.get(self._prefix + key)
+        return loads(raw.decode("utf-8") if isinstance(raw, bytes) else raw)
+
+    def save(self, key, state):
+        self._client.set(self._prefix + key, dumps(state), ex=int(self._ttl_s) or None)
+
+    def delete(self, key):
+        self._client.delete(self._prefix + key)
+
+
+def session_store_from_config(config):
+    """Build a backend from a config mapping such as the ``session_store`` secrets table; None if disabled."""
+    config  = dict(config or {})
+    backend = config.get("backend", "sqlite")
+    ttl_s   = float(config.get("ttl_s", 7 * 86400))
+    if backend == "none":
+        return None
+    if backend == "sqlite":
+        return SQLiteSessionStore(config.get("path", ".session_store.sqlite3"), ttl_s=ttl_s)
+    if backend == "redis":
+        import redis   # optional: only needed for this backend
+
+        return RedisSessionStore(
+            redis.Redis.from_url(config["url"]),
+            prefix=config.get("prefix", "session:"),
+            ttl_s=ttl_s,
+        )
+    raise ValueError(f"Unknown session store backend: {backend}")
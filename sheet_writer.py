@@ -0,0 +1,226 @@
+"""
+Write-behind queue for participant rows.
+
+``submit()`` stores the row in a local SQLite spool and returns immediately;
+a background thread drains the spool into Google Sheets with one
+``append_rows`` call per worksheet, retrying quota and server errors with
+jittered exponential backoff. Rows survive a process restart and are flushed
+by the next writer that opens the same spool.
+"""
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+import uuid
+
+import requests
+from google.auth.exceptions import TransportError
+from gspread.exceptions import APIError
+
+# Status codes worth retrying: rate limit, timeout and server-side errors.
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+# Network failures (connection reset, DNS, timeouts, token refresh that could
+# not reach Google) carry no status code. Anything else - a bad row, a missing
+# worksheet, a bug - will fail the same way again and goes to the dead letters.
+TRANSPORT_ERRORS = (
+    requests.exceptions.ConnectionError,
+    requests.exceptions.Timeout,
+    TransportError,
+    ConnectionError,
+    TimeoutError,
+)
+
+
+def _is_retryable(exc):
+    if isinstance(exc, APIError):
+        return exc.response.status_code in RETRYABLE_STATUS
+    return isinstance(exc, TRANSPORT_ERRORS)
+
+
+class SheetWriter:
+    """
+    Background writer shared by every session of the process.
+
+    ``resolve_worksheet(index)`` returns the gspread worksheet for ``index``;
+    handles are resolved once and reused. Rows claimed by a writer that has
+    not confirmed them within ``claim_timeout`` seconds are picked up again,
+    so several processes can share one spool file.
+    """
+
+    def __init__(self, resolve_worksheet, spool_path=".sheet_spool.sqlite3",
+                 linger=0.5, max_batch=200, backoff_base=1.0, backoff_cap=60.0,
+                 claim_timeout=300.0):
+        self._resolve       = resolve_worksheet
+        self._worksheets    = {}
+        self._linger        = linger
+        self._max_batch     = max_batch
+        self._backoff_base  = backoff_base
+        self._backoff_cap   = backoff_cap
+        self._claim_timeout = claim_timeout
+        self._token         = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._db_lock       = threading.Lock()
+        self._wakeup        = threading.Event()
+        self._stats_lock    = threading.Lock()
+        self._stats         = {
+            "submitted":      0,
+            "flushed_rows":   0,
+            "flush_batches":  0,
+            "retries":        0,
+            "dead_letters":   0,
+            "last_flush_s":   None,
+            "max_flush_s":    0.0,
+            "total_flush_s":  0.0,
+        }
+
+        self._db = sqlite3.connect(spool_path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS spool ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " sheet INTEGER NOT NULL,"
+            " row TEXT NOT NULL,"
+            " enqueued REAL NOT NULL,"
+            " claimed_by TEXT,"
+            " claimed_at REAL,"
+            " dead INTEGER NOT NULL DEFAULT 0,"
+            " error TEXT)"
+        )
+
+        self._thread = threading.Thread(target=self._run, name="sheet-writer", daemon=True)
+        self._thread.start()
+        self._wakeup.set()   # flush anything left over from a previous run
+
+    # ── producer side ──────────────────────────────────────────────────────
+    def submit(self, sheet_index, row):
+        """Durably queue ``row`` for worksheet ``sheet_index``."""
+        with self._db_lock:
+            self._db.execute(
+                "INSERT INTO spool (sheet, row, enqueued) VALUES (?, ?, ?)",
+                (sheet_index, json.dumps(row, ensure_ascii=False), time.time()),
+            )
+        with self._stats_lock:
+            self._stats["submitted"] += 1
+        self._wakeup.set()
+
+    def queue_depth(self):
+        with self._db_lock:
+            (n,) = self._db.execute("SELECT COUNT(*) FROM spool WHERE dead = 0").fetchone()
+        return n
+
+    def stats(self):
+        with self._stats_lock:
+            s = dict(self._stats)
+        s["queue_depth"]  = self.queue_depth()
+        s["mean_flush_s"] = s.pop("total_flush_s") / s["flush_batches"] if s["flush_batches"] else None
+        return s
+
+    # ── consumer side ──────────────────────────────────────────────────────
+    def _claim(self):
+        """Claim up to ``max_batch`` pending rows; returns {sheet: [(id, row, enqueued)]}."""
+        now = time.time()
+        with self._db_lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._db.execute(
+                    "SELECT id, sheet, row, enqueued FROM spool"
+                    " WHERE dead = 0 AND (claimed_by IS NULL OR claimed_at < ?)"
+                    " ORDER BY id LIMIT ?",
+                    (now - self._claim_timeout, self._max_batch),
+                ).fetchall()
+                self._db.executemany(
+                    "UPDATE spool SET claimed_by = ?, claimed_at = ? WHERE id = ?",
+                    [(self._token, now, r[0]) for r in rows],
+                )
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+        batches = {}
+        for rid, sheet, row, enqueued in rows:
+            batches.setdefault(sheet, []).append((rid, json.loads(row), enqueued))
+        return batches
+
+    def _release(self, ids):
+        with self._db_lock:
+            self._db.executemany(
+                "UPDATE spool SET claimed_by = NULL, claimed_at = NULL WHERE id = ?",
+                [(i,) for i in ids],
+            )
+
+    def _delete(self, ids):
+        with self._db_lock:
+            self._db.executemany("DELETE FROM spool WHERE id = ?", [(i,) for i in ids])
+
+    def _bury(self, rid, exc):
+        with self._db_lock:
+            self._db.execute(
+                "UPDATE spool SET dead = 1, claimed_by = NULL, error = ? WHERE id = ?",
+                (repr(exc)[:1000], rid),
+            )
+        with self._stats_lock:
+            self._stats["dead_letters"] += 1
+
+    def _worksheet(self, index):
+        if index not in self._worksheets:
+            self._worksheets[index] = self._resolve(index)
+        return self._worksheets[index]
+
+    def _record_flush(self, entries):
+        now     = time.time()
+        latency = now - min(e[2] for e in entries)
+        with self._stats_lock:
+            self._stats["flushed_rows"]  += len(entries)
+            self._stats["flush_batches"] += 1
+            self._stats["last_flush_s"]   = latency
+            self._stats["max_flush_s"]    = max(self._stats["max_flush_s"], latency)
+            self._stats["total_flush_s"] += latency
+
+    def _flush_sheet(self, index, entries):
+        """Append one coalesced batch. Returns False if it should be retried."""
+        try:
+            self._worksheet(index).append_rows(
+                [e[1] for e in entries], value_input_option="RAW"
+            )
+        except Exception as exc:
+            if _is_retryable(exc):
+                self._release([e[0] for e in entries])
+                return False
+            if len(entries) > 1:
+                # Isolate the offending row(s) so the rest of the batch still lands.
+                return all([self._flush_sheet(index, [e]) for e in entries])
+            self._bury(entries[0][0], exc)
+            return True
+        self._delete([e[0] for e in entries])
+        self._record_flush(entries)
+        return True
+
+    def _run(self):
+        attempt = 0
+        while True:
+            self._wakeup.wait()
+            time.sleep(self._linger)   # let concurrent submissions coalesce
+            self._wakeup.clear()
+            try:
+                batches = self._claim()
+            except Exception:
+                batches = None
+            if not batches:
+                if batches is None:
+                    self._wakeup.set()
+                    time.sleep(self._backoff_base)
+                continue
+
+            ok = all([self._flush_sheet(index, entries) for index, entries in batches.items()])
+            if ok:
+                attempt = 0
+            else:
+                with self._stats_lock:
+                    self._stats["retries"] += 1
+                delay = random.uniform(0, min(self._backoff_cap, self._backoff_base * 2 ** attempt))
+                attempt += 1
+                time.sleep(delay)
+            # Keep draining until the spool is empty.
+            self._wakeup.set()
@@ -0,0 +1,275 @@
+"""
+Process-wide Google Sheets access shared by every Streamlit session.
+
+Streamlit runs all participants of a deployment inside one Python process, so
+the OAuth handshake, the HTTP connection pool and the spreadsheet metadata only
+need to exist once. The study scripts wrap these objects in
+``st.cache_resource`` factories and every session borrows from them.
+"""
+import threading
+import time
+from collections import defaultdict
+
+import gspread
+from google.auth.transport.requests import AuthorizedSession, Request
+from google.oauth2.service_account import Credentials
+from requests.adapters import HTTPAdapter
+
+SHEETS_SCOPES = [
+    "https://www.googleapis.com/auth/spreadsheets",
+    "https://www.googleapis.com/auth/drive",
+]
+
+# Metadata fetches paid by the old per-session code for every worksheet handle:
+# one for open_by_url() and one for the .sheet1 / .get_worksheet() lookup.
+_FETCHES_PER_OPEN = 2
+
+
+# ============================================================================
+# SHARED AUTHORIZED SESSION
+# ============================================================================
+class _SharedSession(AuthorizedSession):
+    """AuthorizedSession whose token refresh is serialised by the pool."""
+
+    def __init__(self, credentials, pool, pool_maxsize):
+        super().__init__(credentials)
+        self._pool = pool
+        # Keep-alive connections for every concurrent participant, instead of
+        # the requests default of 10 that silently drops the rest.
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_maxsize)
+        self.mount("https://", adapter)
+
+    def request(self, method, url, *args, **kwargs):
+        self._pool.ensure_token()
+        return super().request(method, url, *args, **kwargs)
+
+
+# ============================================================================
+# CLIENT POOL
+# ============================================================================
+class SheetsClientPool:
+    """
+    One authorized gspread client and one set of worksheet handles per process.
+
+    Worksheet handles are opened on first use and then handed out to every
+    session. ``stats()`` reports how many OAuth handshakes and metadata fetches
+    the sharing has saved compared with authorizing once per session.
+    """
+
+    def __init__(self, service_account_info, sheet_url, pool_maxsize=64):
+        self._info         = dict(service_account_info)
+        self._url          = sheet_url
+        self._pool_maxsize = pool_maxsize
+        self._lock         = threading.Lock()
+        self._token_lock   = threading.Lock()
+        self._creds        = None
+        self._client       = None
+        self._spreadsheet  = None
+        self._worksheets   = {}
+        self._counters     = {
+            "borrows":          0,
+            "handshakes":       0,
+            "metadata_fetches": 0,
+        }
+
+    # ── authorization ──────────────────────────────────────────────────────
+    def _get_client(self):
+        if self._client is None:
+            self._creds = Credentials.from_service_account_info(
+                self._info, scopes=SHEETS_SCOPES
+            )
+            session = _SharedSession(self._creds, self, self._pool_maxsize)
+            self._client = gspread.Client(auth=None, session=session)
+        return self._client
+
+    def ensure_token(self):
+        """Refresh the access token once for all threads when it expires."""
+        creds = self._creds
+        if creds is None or creds.valid:
+            return
+        with self._token_lock:
+            if not creds.valid:
+                creds.refresh(Request())
+                self._counters["handshakes"] += 1
+
+    # ── worksheet handles ──────────────────────────────────────────────────
+    def worksheet(self, index=0):
+        """Borrow the shared handle for worksheet ``index`` (0 = sheet1)."""
+        with self._lock:
+            ws = self._worksheets.get(index)
+            if ws is None:
+                if self._spreadsheet is None:
+                    self._spreadsheet = self._get_client().open_by_url(self._url)
+                    self._counters["metadata_fetches"] += 1
+                ws = self._spreadsheet.get_worksheet(index)
+                self._counters["metadata_fetches"] += 1
+                if ws is None:
+                    raise gspread.WorksheetNotFound(f"worksheet index {index}")
+                self._worksheets[index] = ws
+            self._counters["borrows"] += 1
+            return ws
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self._counters)
+        borrows = counters["borrows"]
+        counters["handshakes_avoided"] = max(0, borrows - counters["handshakes"])
+        counters["metadata_fetches_avoided"] = max(
+            0, _FETCHES_PER_OPEN * borrows - counters["metadata_fetches"]
+        )
+        return counters
+
+
+# ============================================================================
+# ASSIGNMENT COUNT INDEX — (prompt_key, norm_key) counts without full reads
+# ============================================================================
+class AssignmentIndex:
+    """
+    In-process count of saved rows per (prompt_key, norm_key).
+
+    Seeded once from a narrow B:C read of the main sheet, bumped locally on
+    every save, and reconciled every ``reconcile_interval`` seconds by reading
+    only the rows below the last watermark. Local saves stay in ``_pending``
+    until the reconcile sees them in the sheet, so nothing is counted twice.
+    """
+
+    def __init__(self, worksheet, reconcile_interval=60.0):
+        self._ws           = worksheet
+        self._interval     = reconcile_interval
+        self._lock         = threading.Lock()
+        self._seeded       = False
+        self._sheet_counts = defaultdict(int)
+        self._pending      = defaultdict(int)
+        self._watermark    = 1   # last sheet row already counted (1 = header)
+        self._last_sync    = 0.0
+
+    def _read_new_rows(self):
+        start = self._watermark + 1
+        rows  = self._ws.get_values(f"B{start}:C")
+        for row in rows:
+            if len(row) >= 2 and row[0] and row[1]:
+                key = (row[0], row[1])
+                self._sheet_counts[key] += 1
+                if self._pending.get(key):
+                    self._pending[key] -= 1
+        self._watermark += len(rows)
+        self._last_sync  = time.monotonic()
+
+    def _maybe_sync(self):
+        if not self._seeded:
+            self._read_new_rows()
+            self._seeded = True
+        elif time.monotonic() - self._last_sync >= self._interval:
+            self._read_new_rows()
+
+    def counts(self):
+        """Current counts, reconciling with the sheet when the interval has passed."""
+        with self._lock:
+            self._maybe_sync()
+            merged = defaultdict(int, self._sheet_counts)
+            for key, n in self._pending.items():
+                merged[key] += n
+            return merged
+
+    def record(self, prompt_key, norm_key):
+        """Count a row this process has just appended."""
+        if not prompt_key or not norm_key:
+            return
+        with self._lock:
+            # Before the seed read the new row will be picked up from the sheet.
+            if self._seeded:
+                self._pending[(prompt_key, norm_key)] += 1
+
+
+# ============================================================================
+# PROLIFIC ID SET — duplicate-participant lookup without reading column A
+# ============================================================================
+def normalize_prolific_id(prolific_id):
+    return str(prolific_id).strip().lower()
+
+
+class ProlificIdSet:
+    """
+    Lower-cased set of every Prolific ID already present in column A.
+
+    Loaded once (from ``cache_path`` if given, otherwise from the sheet),
+    updated by ``add()`` after every successful save and refreshed every
+    ``refresh_interval`` seconds by reading only the rows below the watermark.
+
+    The optional cache file is append-only: one ID per line, with ``#<row>``
+    lines recording the sheet watermark at each refresh so a restarted process
+    resumes the incremental read where it left off.
+    """
+
+    def __init__(self, worksheet, cache_path=None, refresh_interval=60.0):
+        self._ws        = worksheet
+        self._path      = cache_path
+        self._interval  = refresh_interval
+        self._lock      = threading.Lock()
+        self._ids       = set()
+        self._loaded    = False
+        self._watermark = 1   # last sheet row already read (1 = header)
+        self._last_sync = 0.0
+
+    # ── on-disk cache ──────────────────────────────────────────────────────
+    def _load_cache(self):
+        if not self._path:
+            return
+        try:
+            with open(self._path, "r", encoding="utf-8") as f:
+                for line in f:
+                    line = line.rstrip("\n")
+                    if line.startswith("#"):
+                        self._watermark = int(line[1:])
+                    elif line:
+                        self._ids.add(line)
+        except FileNotFoundError:
+            pass
+
+    def _append_cache(self, lines):
+        if not self._path or not lines:
+            return
+        try:
+            with open(self._path, "a", encoding="utf-8") as f:
+                f.write("".join(f"{line}\n" for line in lines))
+        except OSError:
+            pass  # the set still works from memory
+
+    # ── sheet sync ─────────────────────────────────────────────────────────
+    def _read_new_rows(self):
+        start = self._watermark + 1
+        rows  = self._ws.get_values(f"A{start}:A")
+        new   = []
+        for row in rows:
+            if row and row[0]:
+                pid = normalize_prolific_id(row[0])
+                if pid not in self._ids:
+                    self._ids.add(pid)
+                    new.append(pid)
+        self._watermark += len(rows)
+        self._last_sync  = time.monotonic()
+        if rows:
+            self._append_cache(new + [f"#{self._watermark}"])
+
+    def _maybe_sync(self):
+        if not self._loaded:
+            self._load_cache()
+            self._read_new_rows()
+            self._loaded = True
+        elif time.monotonic() - self._last_sync >= self._interval:
+            self._read_new_rows()
+
+    def contains(self, prolific_id):
+        with self._lock:
+            self._maybe_sync()
+            return normalize_prolific_id(prolific_id) in self._ids
+
+    def add(self, prolific_id):
+        """Register an ID this process has just saved to the sheet."""
+        pid = normalize_prolific_id(prolific_id)
+        if not pid:
+            return
+        with self._lock:
+            if pid not in self._ids:
+                self._ids.add(pid)
+                self._append_cache([pid])
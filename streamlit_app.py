@@ -1,17 +1,18 @@
 import streamlit as st
-import gspread
 from google.oauth2.service_account import Credentials
 from datetime import datetime
 import json
 import os
 import time
 import random
-from collections import defaultdict
 
 import vertexai
 from vertexai.generative_models import GenerativeModel, ChatSession
 import threading
 
+from sheet_writer import SheetWriter
+from sheets_backend import AssignmentIndex, ProlificIdSet, SheetsClientPool
+
 # ============================================================================
 # PAGE CONFIG
 # ============================================================================
@@ -36,71 +37,86 @@ PROMPTS = load_json("prompts.json")
 NORMS   = load_json("norms.json")
 
 # ============================================================================
-# GOOGLE SHEETS — lazy
+# GOOGLE SHEETS — process-wide client pool shared by all sessions
 # ============================================================================
-def get_sheet():
-    if "gsheet" not in st.session_state:
-        creds = Credentials.from_service_account_info(
-            st.secrets["gcp_service_account"],
-            scopes=[
-                "https://www.googleapis.com/auth/spreadsheets",
-                "https://www.googleapis.com/auth/drive",
-            ],
-        )
-        st.session_state.gsheet = (
-            gspread.authorize(creds)
-            .open_by_url(st.secrets["google_sheet_url"])
-            .sheet1
-        )
-    return st.session_state.gsheet
+@st.cache_resource
+def get_sheets_pool() -> SheetsClientPool:
+    return SheetsClientPool(
+        st.secrets["gcp_service_account"],
+        st.secrets["google_sheet_url"],
+    )
+
+# ============================================================================
+# GOOGLE SHEETS — write-behind queue (rows are spooled to disk, then batched)
+# ============================================================================
+@st.cache_resource
+def get_sheet_writer() -> SheetWriter:
+    return SheetWriter(
+        get_sheets_pool().worksheet,
+        spool_path=st.secrets.get("sheet_spool_path", ".sheet_spool.sqlite3"),
+    )
+
+@st.cache_resource
+def get_prolific_ids() -> ProlificIdSet:
+    return ProlificIdSet(
+        get_sheets_pool().worksheet(0),
+        cache_path=st.secrets.get("prolific_id_cache_path"),
+    )
 
 def check_prolific_id_exists(prolific_id):
-    values = get_sheet().col_values(1)
-    return prolific_id.lower() in [v.lower() for v in values[1:]]
+    return get_prolific_ids().contains(prolific_id)
+
+@st.cache_resource
+def get_assignment_index() -> AssignmentIndex:
+    return AssignmentIndex(get_sheets_pool().worksheet(0))
 
 def get_least_used_combination():
-    sheet  = get_sheet()
-    data   = sheet.get_all_values()
-    counts = defaultdict(int)
-    for p in PROMPTS:
-        for n in NORMS:
-            counts[(p, n)] = 0
-    for row in data[1:]:
-        if len(row) >= 3 and (row[1], row[2]) in counts:
-            counts[(row[1], row[2])] += 1
+    index_counts = get_assignment_index().counts()
+    counts = {(p, n): index_counts.get((p, n), 0) for p in PROMPTS for n in NORMS}
     min_count = min(counts.values())
     return random.choice([k for k, v in counts.items() if v == min_count])
 
 def save_to_google_sheets(row):
-    get_sheet().append_row(row, value_input_option="RAW")
+    get_sheet_writer().submit(0, row)
+    get_assignment_index().record(row[1], row[2])
+    get_prolific_ids().add(row[0])
 
 # ============================================================================
-# VERTEX AI / GEMINI CLIENT — lazy
+# VERTEX AI / GEMINI CLIENT — initialised once per process, shared by sessions
 # ============================================================================
+@st.cache_resource
 def get_gemini_model() -> GenerativeModel:
-    if "gemini_model" not in st.session_state:
-        vertex_creds = Credentials.from_service_account_info(
-            st.secrets["gcp_vertex_account"],
-            scopes=["https://www.googleapis.com/auth/cloud-platform"],
-        )
-        vertexai.init(
-            project=st.secrets["gcp_project_id"],
-            location=st.secrets.get("gcp_location", "europe-west9"),
-            credentials=vertex_creds,
-        )
-        st.session_state.gemini_model = GenerativeModel("gemini-2.5-flash")
-    return st.session_state.gemini_model
+    # vertexai.init mutates module-global state: run it once, never concurrently.
+    vertex_creds = Credentials.from_service_account_info(
+        st.secrets["gcp_vertex_account"],
+        scopes=["https://www.googleapis.com/auth/cloud-platform"],
+    )
+    vertexai.init(
+        project=st.secrets["gcp_project_id"],
+        location=st.secrets.get("gcp_location", "europe-west9"),
+        credentials=vertex_creds,
+    )
+    return GenerativeModel("gemini-2.5-flash")
 
 
+@st.cache_resource
 def preload_gemini_in_background():
-    def _init():
+    """
+    One tiny request per process so the first participant skips the cold start.
+    The model is resolved in the thread, so missing secrets or bad credentials
+    neither block the consent page nor escape the cache (which would retry
+    them on every rerun); the first real call reports the problem.
+    """
+    def _warm_up():
         try:
-            get_gemini_model()
+            get_gemini_model().generate_content(
+                "Reply with OK.", generation_config={"max_output_tokens": 1, "temperature": 0},
+            )
         except Exception:
             pass
-    if not st.session_state.get("gemini_preload_started"):
-        st.session_state.gemini_preload_started = True
-        threading.Thread(target=_init, daemon=True).start()
+    thread = threading.Thread(target=_warm_up, daemon=True)
+    thread.start()
+    return thread
 
 
 def precompute_greeting_in_background():
@@ -0,0 +1,48 @@
+"""
+PromptModels against the real Vertex model class.
+
+The offline stand-in accepts ``system_instruction`` positionally, so only
+the real ``GenerativeModel`` catches a factory called the wrong way. Building
+a model makes no request; an anonymous project is enough.
+"""
+import functools
+import os
+import sys
+
+import pytest
+import vertexai
+from google.auth.credentials import AnonymousCredentials
+from vertexai.generative_models import GenerativeModel
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fake_gemini  # noqa: E402
+from gemini_backend import PromptModels  # noqa: E402
+
+MODEL_NAME  = "gemini-2.5-flash-lite"
+INSTRUCTION = "You are a discussion partner in a study about social norms."
+
+
+@pytest.fixture(scope="module", autouse=True)
+def vertex_project():
+    vertexai.init(project="test-project", location="us-central1", credentials=AnonymousCredentials())
+
+
+@pytest.mark.parametrize("model_class", [GenerativeModel, fake_gemini.FakeGenerativeModel])
+def test_builds_models_with_system_instruction(model_class):
+    factory = functools.partial(model_class, MODEL_NAME)
+    models  = PromptModels(factory(), factory)
+
+    model = models.get(INSTRUCTION)
+
+    assert isinstance(model, model_class)
+    assert model._system_instruction == INSTRUCTION
+    assert models.get(INSTRUCTION) is model
+
+
+def test_shares_the_base_prediction_client():
+    factory = functools.partial(GenerativeModel, MODEL_NAME)
+    base    = factory()
+    client  = base._prediction_client   # created lazily, then handed to every model
+
+    assert PromptModels(base, factory).get(INSTRUCTION)._prediction_client is client